@@ -15,21 +15,50 @@ import base64
 import logging
 from PIL import Image
 import pytesseract # For OCR
+try:
+    import tesserocr # Optional: in-process Tesseract engines (see OcrEnginePool)
+except ImportError:
+    tesserocr = None
 import torchvision.models as models # For Places365
 import torchvision.transforms as transforms # For Places365
 import requests
 import time
 import sys
+import glob
+import json
+import shutil
+import hashlib
+import argparse
+import random
+import math
+import atexit
+import itertools
+import multiprocessing
+import multiprocessing.connection
+from multiprocessing import shared_memory, resource_tracker
+import threading
+import queue
+from collections import namedtuple, deque, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
 from ultralytics import YOLO # Using YOLO from ultralytics for YOLO-World
+try:
+    import onnxruntime as ort # Optional: ONNX Runtime inference backends
+except ImportError:
+    ort = None
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+# True inside an inference worker process (see InferenceWorkerPool), which re-imports this module.
+IN_WORKER_PROCESS = multiprocessing.parent_process() is not None
 
 template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'templates'))
 app = Flask(__name__, template_folder=template_dir)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", max_http_buffer_size=20 * 1024 * 1024, async_mode='threading')
+# Frames can arrive as binary attachments (raw JPEG/PNG or pixel buffers), so the payload cap
+# no longer has to absorb base64 overhead; override with MAX_HTTP_BUFFER_SIZE_MB if needed.
+MAX_HTTP_BUFFER_SIZE_MB = float(os.environ.get('MAX_HTTP_BUFFER_SIZE_MB', 20))
+socketio = SocketIO(app, cors_allowed_origins="*", max_http_buffer_size=int(MAX_HTTP_BUFFER_SIZE_MB * 1024 * 1024), async_mode='threading')
 
 
 # --- Tesseract Configuration ---
@@ -56,86 +85,1171 @@ def test_db_connection():
 class User(db.Model):
     __tablename__ = 'users'; id = db.Column(db.Integer, primary_key=True); name = db.Column(db.String(255), nullable=False); email = db.Column(db.String(255), nullable=False, unique=True); password = db.Column(db.String(255), nullable=False); customization = db.Column(db.String(255), default='0' * 255)
 with app.app_context():
-    try: db.create_all();
+    try:
+        if not IN_WORKER_PROCESS: db.create_all();
     except Exception as e: logger.error(f"Error during DB setup: {e}", exc_info=True)
 
 # --- Constants ---
 # Object detection confidence threshold
 OBJECT_DETECTION_CONFIDENCE = 0.35
+# Model files are read from MODEL_CACHE_DIR only (populate it with `python App.py --fetch-models`),
+# including the CLIP text encoder YOLO-World uses for class embeddings (MODEL_CACHE_DIR/clip,
+# instead of CLIP's default ~/.cache/clip). Nothing is downloaded at startup.
+# Models load in background threads at startup (MODEL_WARMUP) or on first use; requests for a
+# model that isn't ready yet get {'status': 'loading'}.
+MODEL_CACHE_DIR = os.environ.get('MODEL_CACHE_DIR', os.path.dirname(os.path.abspath(__file__)))
+MODEL_WARMUP = os.environ.get('MODEL_WARMUP', 'True').lower() == 'true'
+MODEL_RETRY_INTERVAL_S = float(os.environ.get('MODEL_RETRY_INTERVAL_S', 60))
+# CPU inference backends. PLACES_BACKEND: torch | torchscript | onnx | onnx-int8.
+# YOLO_BACKEND: torch | onnx | openvino (exports use a fixed TARGET_CLASSES vocabulary and
+# YOLO_EXPORT_IMGSZ; pick a smaller YOLO_MODEL_FILE such as yolov8s-worldv2.pt for more speed).
+# Exported artifacts are cached in ENGINE_CACHE_DIR. Check accuracy with --check-backends.
+# onnx-int8 is statically quantized, calibrated on the images in PLACES_CALIBRATION_DIR
+# (--check-backends calibrates on its sample dir when this is unset).
+PLACES_BACKEND = os.environ.get('PLACES_BACKEND', 'torch').lower()
+PLACES_CALIBRATION_DIR = os.environ.get('PLACES_CALIBRATION_DIR', '')
+PLACES_CALIBRATION_SAMPLES = int(os.environ.get('PLACES_CALIBRATION_SAMPLES', 100))
+YOLO_BACKEND = os.environ.get('YOLO_BACKEND', 'torch').lower()
+YOLO_EXPORT_IMGSZ = int(os.environ.get('YOLO_EXPORT_IMGSZ', 640))
+ENGINE_CACHE_DIR = os.environ.get('ENGINE_CACHE_DIR', os.path.join(MODEL_CACHE_DIR, 'engines'))
+ORT_INTRA_OP_THREADS = int(os.environ.get('ORT_INTRA_OP_THREADS', 0)) # 0 = ONNX Runtime default
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+# Per-task input resolution: each frame is downscaled once (cv2.INTER_AREA) to what each model
+# actually uses. YOLO gets its input size (imgsz) on the longer side, Places365 a
+# SCENE_INPUT_SIZE square, and OCR at most OCR_MAX_INPUT_SIDE (0 = full resolution, small
+# print needs the pixels). Clients may request any of YOLO_IMGSZ_LEVELS per message
+# ('imgsz'); exported YOLO backends always run at YOLO_EXPORT_IMGSZ.
+YOLO_IMGSZ = int(os.environ.get('YOLO_IMGSZ', 640))
+YOLO_IMGSZ_LEVELS = tuple(sorted({int(v) for v in os.environ.get('YOLO_IMGSZ_LEVELS', '320,416,512,640').split(',') if v.strip()} | {YOLO_IMGSZ}))
+SCENE_INPUT_SIZE = 256 # scene_transform resizes to 256x256 before its 224 center crop
+OCR_MAX_INPUT_SIDE = int(os.environ.get('OCR_MAX_INPUT_SIDE', 0))
+# Per-session latency budget controller. An EWMA of each session's request latency is kept
+# under LATENCY_BUDGET_MS by stepping the YOLO input size down, then the suggested capture
+# frame rate (between CAPTURE_MIN_FPS and CAPTURE_MAX_FPS). Clients may send their own
+# 'latency_budget_ms'; 0 disables the controller.
+LATENCY_BUDGET_MS = float(os.environ.get('LATENCY_BUDGET_MS', 500))
+LATENCY_EWMA_ALPHA = 0.3
+LATENCY_CONTROLLER_COOLDOWN = max(1, int(os.environ.get('LATENCY_CONTROLLER_COOLDOWN', 5))) # Requests between adjustments
+CAPTURE_MAX_FPS = float(os.environ.get('CAPTURE_MAX_FPS', 10))
+CAPTURE_MIN_FPS = float(os.environ.get('CAPTURE_MIN_FPS', 1))
+# Per-stage latency histograms exposed at /metrics (Prometheus text format). Each timing
+# observation is kept with probability METRICS_SAMPLE_RATE; METRICS_ENABLED=false turns timing off.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_SAMPLE_RATE = min(1.0, max(0.0, float(os.environ.get('METRICS_SAMPLE_RATE', 1.0))))
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
 # Max objects to return in normal mode
 MAX_OBJECTS_TO_RETURN = 3
+# Detection types accepted in the 'message' payload
+SUPPORTED_DETECTION_TYPES = {'object_detection', 'focus_detection', 'scene_detection', 'text_detection', 'multi_detection'}
+# multi_detection: one frame, several tasks (payload 'tasks', e.g. ["object", "scene", "text"]) run
+# concurrently on the session's own task threads; tasks still running after MULTI_TASK_TIMEOUT_S
+# are reported as {'status': 'timeout'} and the rest is returned as a partial result. The
+# session's next frame waits until the timed-out tasks have finished.
+MULTI_DETECTION_TASKS = {'object': 'object_detection', 'focus': 'focus_detection', 'scene': 'scene_detection', 'text': 'text_detection'}
+MULTI_TASK_TIMEOUT_S = float(os.environ.get('MULTI_TASK_TIMEOUT_S', 5.0))
+# Focus mode predicts against a small vocabulary: the focus object (any user-supplied name,
+# not only TARGET_CLASSES) plus these distractor classes. FOCUS_SMALL_VOCABULARY=false
+# restores predicting all TARGET_CLASSES and filtering afterwards.
+FOCUS_SMALL_VOCABULARY = os.environ.get('FOCUS_SMALL_VOCABULARY', 'True').lower() == 'true'
+FOCUS_DISTRACTOR_CLASSES = [c.strip().lower() for c in os.environ.get('FOCUS_DISTRACTOR_CLASSES', 'person,chair,table,door,wall').split(',') if c.strip()]
+MAX_FOCUS_OBJECT_LENGTH = 64
+# A session may introduce a not-yet-encoded focus vocabulary (one CLIP text-encoder pass)
+# at most once per FOCUS_NEW_VOCABULARY_INTERVAL_S; faster requests get {'status': 'loading'}.
+FOCUS_NEW_VOCABULARY_INTERVAL_S = float(os.environ.get('FOCUS_NEW_VOCABULARY_INTERVAL_S', 2.0))
+# Focus mode tracking: full detection runs every FOCUS_REDETECT_INTERVAL frames (or when the
+# tracker's correlation score drops below FOCUS_TRACKER_MIN_SCORE); frames in between are
+# answered from a template-matching tracker on a TRACKER_WORK_WIDTH-wide grayscale frame.
+FOCUS_TRACKING_ENABLED = os.environ.get('FOCUS_TRACKING_ENABLED', 'True').lower() == 'true'
+FOCUS_REDETECT_INTERVAL = int(os.environ.get('FOCUS_REDETECT_INTERVAL', 5))
+FOCUS_TRACKER_MIN_SCORE = float(os.environ.get('FOCUS_TRACKER_MIN_SCORE', 0.6))
+FOCUS_TRACKER_SEARCH_SCALE = float(os.environ.get('FOCUS_TRACKER_SEARCH_SCALE', 2.5))
+TRACKER_WORK_WIDTH = int(os.environ.get('TRACKER_WORK_WIDTH', 320))
+# OCR engine: 'pool' keeps long-lived in-process Tesseract engines (needs tesserocr),
+# 'subprocess' runs pytesseract (one tesseract process per call). OCR_POOL_SIZE engines
+# per language by default, overridable per language with e.g. OCR_POOL_SIZES='eng:4,ara:1'.
+OCR_ENGINE = os.environ.get('OCR_ENGINE', 'pool').lower()
+OCR_POOL_SIZE = int(os.environ.get('OCR_POOL_SIZE', 2))
+OCR_POOL_SIZES = os.environ.get('OCR_POOL_SIZES', '')
+OCR_POOL_IDLE_TIMEOUT_S = float(os.environ.get('OCR_POOL_IDLE_TIMEOUT_S', 600))
+TESSDATA_PATH = os.environ.get('TESSDATA_PREFIX')
+# Text localization before OCR: only candidate regions (found on a frame downscaled to
+# TEXT_LOCALIZATION_WIDTH) are OCR'd, frames without candidates skip Tesseract entirely.
+# TEXT_RETURN_REGIONS adds per-region boxes to text_detection responses.
+TEXT_REGION_DETECTION = os.environ.get('TEXT_REGION_DETECTION', 'True').lower() == 'true'
+TEXT_LOCALIZATION_WIDTH = int(os.environ.get('TEXT_LOCALIZATION_WIDTH', 640))
+TEXT_REGION_MERGE_GAP = float(os.environ.get('TEXT_REGION_MERGE_GAP', 0.015)) # Fraction of frame width
+TEXT_MAX_REGIONS = int(os.environ.get('TEXT_MAX_REGIONS', 12))
+# Tesseract page segmentation mode for region crops (6 = single block, 7 = single line); the
+# default automatic layout analysis only costs time on a crop that holds one block of text.
+OCR_REGION_PSM = int(os.environ.get('OCR_REGION_PSM', 6))
+TEXT_RETURN_REGIONS = os.environ.get('TEXT_RETURN_REGIONS', 'False').lower() == 'true'
+# Multi-process inference: worker processes per task kind, e.g. INFERENCE_WORKERS='object:2,scene:1,text:4'
+# (empty = run inference in the server process). Frames reach workers through shared-memory
+# ring buffers of SHM_SLOTS_PER_WORKER slots per worker, SHM_SLOT_BYTES each (larger frames are
+# sent inline). Workers stuck on a task for WORKER_TASK_TIMEOUT_S are restarted. Idle workers
+# report their model states and metrics every WORKER_STATUS_INTERVAL_S.
+INFERENCE_WORKERS = os.environ.get('INFERENCE_WORKERS', '')
+SHM_SLOTS_PER_WORKER = int(os.environ.get('SHM_SLOTS_PER_WORKER', 2))
+SHM_SLOT_BYTES = int(os.environ.get('SHM_SLOT_BYTES', 8 * 1024 * 1024))
+WORKER_TASK_TIMEOUT_S = float(os.environ.get('WORKER_TASK_TIMEOUT_S', 30))
+WORKER_START_METHOD = os.environ.get('WORKER_START_METHOD', 'spawn')
+WORKER_STATUS_INTERVAL_S = float(os.environ.get('WORKER_STATUS_INTERVAL_S', 2))
+# Bulk mode (POST /bulk, --bulk): inputs and outputs must live under BULK_DATA_DIR.
+# Bulk object frames share the live batcher / object workers, at most BULK_MAX_INFLIGHT per
+# job at a time, so a long job never crowds out live clients.
+BULK_MAX_INFLIGHT = max(1, int(os.environ.get('BULK_MAX_INFLIGHT', 2)))
+BULK_DATA_DIR = os.path.abspath(os.environ.get('BULK_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bulk')))
+# Bounds for the cache of computed class-text embeddings (per class set)
+CLASS_EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get('CLASS_EMBEDDING_CACHE_MAX_ENTRIES', 32))
+CLASS_EMBEDDING_CACHE_MAX_CLASSES = int(os.environ.get('CLASS_EMBEDDING_CACHE_MAX_CLASSES', 2048))
+# Cross-client micro-batching for YOLO-World (object_detection + focus_detection).
+# Frames from all sessions are collected for up to YOLO_BATCH_MAX_WAIT_MS (or until
+# YOLO_BATCH_MAX_SIZE frames are pending) and run through the model as one batch.
+# Set YOLO_BATCH_MAX_SIZE=1 to disable batching.
+YOLO_BATCH_MAX_SIZE = max(1, int(os.environ.get('YOLO_BATCH_MAX_SIZE', 8)))
+YOLO_BATCH_MAX_WAIT_MS = max(0.0, float(os.environ.get('YOLO_BATCH_MAX_WAIT_MS', 10)))
+# Per-session latest-frame-wins queue: frames allowed to wait behind the one being processed.
+# Older waiting frames are dropped when a newer one arrives.
+SESSION_QUEUE_MAX_PENDING = max(1, int(os.environ.get('SESSION_QUEUE_MAX_PENDING', 1)))
+# Whether dropped frames get a {'status': 'dropped'} response (False = silently ignored)
+SEND_DROPPED_RESPONSES = os.environ.get('SEND_DROPPED_RESPONSES', 'True').lower() == 'true'
+# Temporal result cache for scene/text detection, keyed by a 64-bit dHash of the frame.
+# A new frame reuses a cached result when its hash is within MAX_DISTANCE bits and the
+# entry is younger than TTL seconds. Set a TTL to 0 to disable that cache. Text uses a much
+# finer TEXT_CACHE_HASH_SIZE x TEXT_CACHE_HASH_SIZE dHash of the OCR input: two pages of a
+# document (or two similar signs) look alike in a 9x8 thumbnail, and a reading aid must not
+# answer a turned page with the previous page's text.
+SCENE_CACHE_TTL_S = float(os.environ.get('SCENE_CACHE_TTL_S', 3.0))
+SCENE_CACHE_MAX_DISTANCE = int(os.environ.get('SCENE_CACHE_MAX_DISTANCE', 8))
+TEXT_CACHE_TTL_S = float(os.environ.get('TEXT_CACHE_TTL_S', 2.0))
+TEXT_CACHE_HASH_SIZE = int(os.environ.get('TEXT_CACHE_HASH_SIZE', 32)) # 1024-bit hash
+TEXT_CACHE_MAX_DISTANCE = int(os.environ.get('TEXT_CACHE_MAX_DISTANCE', 16))
+FRAME_CACHE_MAX_ENTRIES = int(os.environ.get('FRAME_CACHE_MAX_ENTRIES', 8))
 
 
-# --- ML Model Loading ---
-logger.info("Loading ML models...")
-try:
-    # --- Load YOLO-World Model ---
-    logger.info("Loading YOLO-World model...")
-    # yolo_model_path = 'yolov8x-worldv2.pt', you can download your preferred model from this link
-    # https://huggingface.co/Bingsu/yolo-world-mirror/tree/main
-    yolo_model_path = 'yolov8x-worldv2.pt'
-    yolo_model = YOLO(yolo_model_path)
-    logger.info(f"YOLO-World model loaded from {yolo_model_path}.")
-
-    # --- Define TARGET_CLASSES for YOLO-World (Crucial!) ---
-    # This list *must* contain potential objects you want the model to recognize,
-    # even in focus mode (it helps the model calibrate).
-    TARGET_CLASSES = [
-        # --- Standard COCO Classes ---
-        'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
-        'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog',
-        'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella',
-        'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball', 'kite',
-        'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket', 'bottle',
-        'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple', 'sandwich',
-        'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch',
-        'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 'remote',
-        'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 'book',
-        'clock', 'vase', 'scissors', 'teddy bear', 'hair drier', 'toothbrush',
-        # --- Add MORE classes relevant to your application ---
-        'traffic cone', 'pen', 'stapler', 'monitor', 'speaker', 'desk lamp', 'trash can', 'bin',
-        'stairs', 'door', 'window', 'picture frame', 'whiteboard', 'projector', 'ceiling fan',
-        'pillow', 'blanket', 'towel', 'soap', 'shampoo', 'power outlet', 'light switch', 'keys',
-        # ... continue adding ...
-    ]
+# --- Model Constants ---
+# yolo_model_file = 'yolov8x-worldv2.pt', you can download your preferred model from this link
+# https://huggingface.co/Bingsu/yolo-world-mirror/tree/main
+YOLO_MODEL_FILE = os.environ.get('YOLO_MODEL_FILE', 'yolov8x-worldv2.pt')
+PLACES_WEIGHTS_FILE = 'resnet50_places365.pth.tar'
+PLACES_WEIGHTS_URL = 'http://places2.csail.mit.edu/models_places365/resnet50_places365.pth.tar'
+PLACES_LABELS_FILE = 'categories_places365.txt'
+PLACES_LABELS_URL = 'https://raw.githubusercontent.com/csailvision/places365/master/categories_places365.txt'
+CLIP_MODEL_FILE = os.path.join('clip', 'ViT-B-32.pt') # Text encoder behind YOLO-World set_classes()
+
+# --- Define TARGET_CLASSES for YOLO-World (Crucial!) ---
+# This list *must* contain potential objects you want the model to recognize
+# in normal mode (focus mode uses focus_vocabulary()).
+TARGET_CLASSES = [
+    # --- Standard COCO Classes ---
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
+    'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog',
+    'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella',
+    'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball', 'kite',
+    'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket', 'bottle',
+    'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple', 'sandwich',
+    'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch',
+    'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 'remote',
+    'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 'book',
+    'clock', 'vase', 'scissors', 'teddy bear', 'hair drier', 'toothbrush',
+    # --- Add MORE classes relevant to your application ---
+    'traffic cone', 'pen', 'stapler', 'monitor', 'speaker', 'desk lamp', 'trash can', 'bin',
+    'stairs', 'door', 'window', 'picture frame', 'whiteboard', 'projector', 'ceiling fan',
+    'pillow', 'blanket', 'towel', 'soap', 'shampoo', 'power outlet', 'light switch', 'keys',
+    # ... continue adding ...
+]
+
+# --- Tesseract Supported Languages ---
+SUPPORTED_OCR_LANGS = {'eng', 'ara', 'fas', 'urd', 'uig', 'hin', 'mar', 'nep', 'rus','chi_sim', 'chi_tra', 'jpn', 'kor', 'tel', 'kan', 'ben'}
+DEFAULT_OCR_LANG = 'eng'
+logger.info(f"Tesseract OCR: Supported={SUPPORTED_OCR_LANGS}, Default={DEFAULT_OCR_LANG}")
+
+# --- Image Transforms for Scene Classification ---
+scene_transform = transforms.Compose([transforms.Resize((256, 256)), transforms.CenterCrop(224), transforms.ToTensor(), transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])])
+
+
+# --- Metrics ---
+class Histogram:
+    """ Minimal thread-safe Prometheus histogram keyed by a tuple of label values. """
+    def __init__(self, name, help_text, label_names, buckets=METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {} # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None: series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound: series[i] += 1; break
+            series[-2] += value
+            series[-1] += 1
+
+    def drain(self):
+        """ Returns and clears all series (inference workers ship these deltas to the front end). """
+        with self._lock: series, self._series = self._series, {}
+        return series
+
+    def merge(self, series):
+        """ Adds series drained from another process. """
+        with self._lock:
+            for labels, values in series.items():
+                mine = self._series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+                for i, value in enumerate(values): mine[i] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock: snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            label_str = ','.join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            sep = ',' if label_str else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_str}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_str}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{label_str}}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{label_str}}} {series[-1]}')
+        return lines
+
+class Counter:
+    """ Minimal thread-safe Prometheus counter keyed by a tuple of label values. """
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock: self._values[labels] = self._values.get(labels, 0) + amount
+
+    def drain(self):
+        with self._lock: values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        for labels, amount in values.items(): self.inc(labels, amount)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock: snapshot = dict(self._values)
+        for labels, value in sorted(snapshot.items()):
+            label_str = ','.join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            lines.append(f'{self.name}{{{label_str}}} {value}')
+        return lines
+
+def _gauge_lines(name, help_text, samples):
+    """ Renders a gauge from (labels_dict, value) pairs computed at scrape time. """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        label_str = ','.join(f'{k}="{v}"' for k, v in labels.items())
+        lines.append(f'{name}{{{label_str}}} {value}' if label_str else f'{name} {value}')
+    return lines
+
+stage_seconds = Histogram('visionaid_stage_seconds', "Time spent per processing stage.", ['detection_type', 'stage'])
+request_seconds = Histogram('visionaid_request_seconds', "End-to-end handle_message time per detection type.", ['detection_type'])
+yolo_batch_frames = Histogram('visionaid_yolo_batch_frames', "Frames per YOLO-World predict() call.", [], buckets=(1, 2, 4, 8, 16, 32, 64))
+requests_total = Counter('visionaid_requests_total', "Processed requests by detection type and result status.", ['detection_type', 'status'])
+errors_total = Counter('visionaid_errors_total', "Errors by detection type and stage.", ['detection_type', 'stage'])
+
+class _StageTimer:
+    __slots__ = ('labels', 'start')
+    def __init__(self, labels): self.labels = labels
+    def __enter__(self): self.start = time.perf_counter(); return self
+    def __exit__(self, *exc_info): stage_seconds.observe(time.perf_counter() - self.start, self.labels); return False
+
+class _NullTimer:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc_info): return False
+
+_NULL_TIMER = _NullTimer()
+
+def metrics_sampled():
+    """ Per-observation sampling decision (METRICS_ENABLED / METRICS_SAMPLE_RATE). """
+    return METRICS_ENABLED and (METRICS_SAMPLE_RATE >= 1.0 or random.random() < METRICS_SAMPLE_RATE)
+
+def stage_timer(detection_type, stage):
+    """ Context manager timing one stage into visionaid_stage_seconds (a shared no-op when not sampled). """
+    return _StageTimer((detection_type, stage)) if metrics_sampled() else _NULL_TIMER
+
+
+# --- Model Registry ---
+class ModelNotReady(Exception):
+    """ Raised by ModelRegistry.get() when a model is still loading or failed to load. """
+    def __init__(self, name, state, error=None):
+        super().__init__(f"Model '{name}' is {state}" + (f": {error}" if error else ""))
+        self.name = name
+        self.state = state
+        self.error = error
+
+class ModelRegistry:
+    """
+    Loads ML models on first use or in background warm-up threads.
+
+    Each model loads (and fails) independently on its own thread, so the server accepts
+    connections immediately and a slow or broken model doesn't hold back the others.
+    get() returns a ready model or raises ModelNotReady; failed loads are retried on
+    demand after MODEL_RETRY_INTERVAL_S.
+    """
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._status = {} # name -> {'state', 'load_time_s', 'error', 'failed_at'}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        with self._lock:
+            self._loaders[name] = loader
+            self._status[name] = {'state': 'pending', 'load_time_s': None, 'error': None, 'failed_at': None}
+
+    def _load(self, name):
+        logger.info(f"Loading model '{name}'...")
+        start = time.time()
+        try:
+            model = self._loaders[name]()
+        except Exception as e:
+            logger.error(f"Model '{name}' failed to load after {time.time() - start:.2f}s: {e}", exc_info=True)
+            with self._lock: self._status[name].update(state='failed', error=str(e), failed_at=time.monotonic())
+            return
+        load_time = time.time() - start
+        with self._lock:
+            self._models[name] = model
+            self._status[name].update(state='ready', load_time_s=round(load_time, 2), error=None)
+        logger.info(f"Model '{name}' ready in {load_time:.2f}s.")
+
+    def _start_load(self, name):
+        """ Starts a background load unless one is running or the model is ready. Returns the current state. """
+        with self._lock:
+            status = self._status[name]
+            retry = status['state'] == 'failed' and time.monotonic() - status['failed_at'] >= MODEL_RETRY_INTERVAL_S
+            if status['state'] == 'pending' or retry:
+                status['state'] = 'loading'
+                threading.Thread(target=self._load, args=(name,), name=f'model-load-{name}', daemon=True).start()
+            return status['state'], status['error']
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None: return model
+        state, error = self._start_load(name)
+        raise ModelNotReady(name, state, error)
+
+    def warm_up(self, names=None):
+        """ Starts loading the given (default: all) models in the background. """
+        for name in (names or list(self._loaders)):
+            self._start_load(name)
+
+    def is_ready(self, name):
+        return name in self._models
+
+    def states(self):
+        with self._lock:
+            return {name: {k: v for k, v in status.items() if k != 'failed_at'} for name, status in self._status.items()}
+
+def model_path(filename):
+    """ Resolves a model file inside MODEL_CACHE_DIR; raises if it is not there (no downloads at runtime). """
+    path = os.path.join(MODEL_CACHE_DIR, filename)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found. Run 'python App.py --fetch-models' once to populate MODEL_CACHE_DIR.")
+    return path
+
+def use_local_clip_cache():
+    """
+    Makes the CLIP package (loaded by ultralytics for YOLO-World class embeddings) read and
+    download its weights in MODEL_CACHE_DIR/clip rather than ~/.cache/clip.
+    """
+    import clip # Installed with ultralytics' CLIP fork (see requirements.txt)
+    if getattr(clip.load, '_uses_model_cache', False): return
+    clip_load = clip.load
+    def load(*args, **kwargs):
+        kwargs.setdefault('download_root', os.path.join(MODEL_CACHE_DIR, os.path.dirname(CLIP_MODEL_FILE)))
+        return clip_load(*args, **kwargs)
+    load._uses_model_cache = True
+    clip.load = load
+
+def load_yolo_model():
+    model_path(CLIP_MODEL_FILE) # Fail clearly instead of letting CLIP download at startup
+    use_local_clip_cache()
+    yolo_model = YOLO(model_path(YOLO_MODEL_FILE))
     logger.info(f"Setting {len(TARGET_CLASSES)} target classes for YOLO-World.")
-    yolo_model.set_classes(TARGET_CLASSES)
-    logger.info("YOLO-World classes set.")
-
-    # --- Load Places365 Model ---
-    # (Keep the load_places365_model function as before)
-    def load_places365_model():
-        logger.info("Loading Places365 model..."); model = models.resnet50(weights=None); model.fc = torch.nn.Linear(model.fc.in_features, 365); weights_filename = 'resnet50_places365.pth.tar'; weights_url = 'http://places2.csail.mit.edu/models_places365/resnet50_places365.pth.tar'
-        if not os.path.exists(weights_filename): logger.info(f"Downloading Places365 weights..."); response = requests.get(weights_url, timeout=120); response.raise_for_status(); f = open(weights_filename, 'wb'); f.write(response.content); f.close(); logger.info("Places365 weights downloaded.")
-        checkpoint = torch.load(weights_filename, map_location=torch.device('cpu')); state_dict = checkpoint.get('state_dict', checkpoint); state_dict = {k.replace('module.', ''): v for k, v in state_dict.items()}; model.load_state_dict(state_dict); logger.info("Places365 model weights loaded."); model.eval(); return model
-    places_model = load_places365_model()
-
-    # --- Load Places365 Labels ---
-    # (Keep the Places365 label loading logic as before)
-    places_labels = []; places_labels_filename = 'categories_places365.txt'; places_labels_url = 'https://raw.githubusercontent.com/csailvision/places365/master/categories_places365.txt'
+    yolo_model.set_classes(list(TARGET_CLASSES))
+    return yolo_model
+
+def load_places365_model():
+    model = models.resnet50(weights=None); model.fc = torch.nn.Linear(model.fc.in_features, 365)
+    checkpoint = torch.load(model_path(PLACES_WEIGHTS_FILE), map_location=torch.device('cpu')); state_dict = checkpoint.get('state_dict', checkpoint); state_dict = {k.replace('module.', ''): v for k, v in state_dict.items()}; model.load_state_dict(state_dict); model.eval(); return model
+
+def load_places365_labels():
+    """ Reads Places365 labels from MODEL_CACHE_DIR, falling back to generic names if missing. """
+    labels = []
     try:
-        if not os.path.exists(places_labels_filename): logger.info(f"Downloading Places365 labels..."); response = requests.get(places_labels_url, timeout=30); response.raise_for_status(); f = open(places_labels_filename, 'w', encoding='utf-8'); f.write(response.text); f.close(); logger.info("Places365 labels downloaded.")
-        with open(places_labels_filename, 'r', encoding='utf-8') as f:
+        with open(model_path(PLACES_LABELS_FILE), 'r', encoding='utf-8') as f:
             for line in f:
-                if line.strip(): parts = line.strip().split(' '); label = parts[0].split('/')[-1]; places_labels.append(label)
-        logger.info(f"Loaded {len(places_labels)} Places365 labels.")
-    except Exception as e: logger.error(f"Failed to load Places365 labels: {e}", exc_info=True); places_labels = [f"Label {i}" for i in range(365)]; logger.warning("Using fallback Places365 labels.")
+                if line.strip(): parts = line.strip().split(' '); label = parts[0].split('/')[-1]; labels.append(label)
+        logger.info(f"Loaded {len(labels)} Places365 labels.")
+    except Exception as e: logger.error(f"Failed to load Places365 labels: {e}", exc_info=False); labels = [f"Label {i}" for i in range(365)]; logger.warning("Using fallback Places365 labels.")
+    return labels
+
+def fetch_model_files():
+    """
+    Downloads every model file into MODEL_CACHE_DIR (the only step that touches the network).
+    Run once per machine/image: python App.py --fetch-models
+    """
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    for filename, url, timeout in ((PLACES_WEIGHTS_FILE, PLACES_WEIGHTS_URL, 120), (PLACES_LABELS_FILE, PLACES_LABELS_URL, 30)):
+        path = os.path.join(MODEL_CACHE_DIR, filename)
+        if os.path.exists(path): logger.info(f"{filename} already cached."); continue
+        logger.info(f"Downloading {filename}..."); response = requests.get(url, timeout=timeout); response.raise_for_status()
+        with open(path, 'wb') as f: f.write(response.content)
+        logger.info(f"{filename} downloaded.")
+    # Ultralytics downloads release assets to the given path; set_classes() also fetches the
+    # CLIP text encoder, which use_local_clip_cache() redirects into MODEL_CACHE_DIR/clip.
+    use_local_clip_cache()
+    YOLO(os.path.join(MODEL_CACHE_DIR, YOLO_MODEL_FILE)).set_classes(list(TARGET_CLASSES))
+    logger.info(f"Model files cached in {MODEL_CACHE_DIR}.")
+
+# --- Inference Engines ---
+# Places365 backends take a float32 NCHW batch (numpy) and return logits (numpy).
+PLACES_BACKENDS = ('torch', 'torchscript', 'onnx', 'onnx-int8')
+YOLO_BACKENDS = ('torch', 'onnx', 'openvino')
+PLACES_INPUT_SHAPE = (1, 3, 224, 224)
+
+def _artifact_is_fresh(artifact, source):
+    """ True if a cached export exists and is newer than the file it was built from. """
+    return os.path.exists(artifact) and os.path.getmtime(artifact) >= os.path.getmtime(source)
+
+def _engine_artifact(filename):
+    os.makedirs(ENGINE_CACHE_DIR, exist_ok=True)
+    return os.path.join(ENGINE_CACHE_DIR, filename)
+
+class TorchEngine:
+    """ Runs a PyTorch eager or TorchScript module. """
+    def __init__(self, module):
+        self.module = module
+
+    def __call__(self, batch):
+        with torch.no_grad():
+            return self.module(torch.from_numpy(batch)).numpy()
+
+class OnnxRuntimeEngine:
+    """ Runs an ONNX model on the ONNX Runtime CPU execution provider. """
+    def __init__(self, path):
+        if ort is None: raise RuntimeError("onnxruntime is not installed")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ORT_INTRA_OP_THREADS > 0: options.intra_op_num_threads = ORT_INTRA_OP_THREADS
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch):
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+
+def _sample_images(sample_dir, limit):
+    """ Decoded BGR images from the image files in sample_dir (sorted by name, at most limit). """
+    paths = sorted(p for p in glob.glob(os.path.join(sample_dir, '*')) if p.lower().endswith(IMAGE_EXTENSIONS))[:limit]
+    return [img for img in (cv2.imread(p) for p in paths) if img is not None]
+
+def _quantize_places_static(fp32_path, int8_path, calibration_dir):
+    """
+    Static int8 QDQ quantization of the Places365 ONNX model: activation ranges are
+    calibrated by running the fp32 model over the images in calibration_dir, so the
+    convolutions run as int8 kernels instead of dequantizing weights on every call.
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    images = _sample_images(calibration_dir, PLACES_CALIBRATION_SAMPLES) if calibration_dir else []
+    if not images: raise RuntimeError(f"onnx-int8 needs calibration images: set PLACES_CALIBRATION_DIR (got '{calibration_dir}')")
+
+    class PlacesCalibrationReader(CalibrationDataReader):
+        def __init__(self): self.inputs = iter([{'input': _places_input(img)} for img in images])
+        def get_next(self): return next(self.inputs, None)
+
+    logger.info(f"Quantizing Places365 ONNX model to int8 (static, {len(images)} calibration images)...")
+    quantize_static(fp32_path, int8_path + '.tmp', PlacesCalibrationReader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+    os.replace(int8_path + '.tmp', int8_path)
+
+def build_places_engine(backend, calibration_dir=None):
+    """
+    Builds the Places365 engine for a backend in PLACES_BACKENDS. TorchScript and ONNX
+    artifacts are exported into ENGINE_CACHE_DIR on first use and re-exported when the
+    source weights are newer. 'onnx-int8' is statically quantized, calibrated on the
+    images in calibration_dir (default PLACES_CALIBRATION_DIR).
+    """
+    weights = model_path(PLACES_WEIGHTS_FILE)
+    if backend == 'torch':
+        return TorchEngine(load_places365_model())
+    if backend == 'torchscript':
+        path = _engine_artifact('places365.torchscript.pt')
+        if not _artifact_is_fresh(path, weights):
+            logger.info("Exporting Places365 to TorchScript...")
+            with torch.no_grad(): traced = torch.jit.trace(load_places365_model(), torch.zeros(PLACES_INPUT_SHAPE))
+            traced.save(path + '.tmp'); os.replace(path + '.tmp', path)
+        return TorchEngine(torch.jit.optimize_for_inference(torch.jit.load(path, map_location='cpu').eval()))
+    if backend in ('onnx', 'onnx-int8'):
+        if ort is None: raise RuntimeError("onnxruntime is not installed")
+        fp32_path = _engine_artifact('places365.onnx')
+        if not _artifact_is_fresh(fp32_path, weights):
+            logger.info("Exporting Places365 to ONNX...")
+            torch.onnx.export(load_places365_model(), torch.zeros(PLACES_INPUT_SHAPE), fp32_path + '.tmp', input_names=['input'], output_names=['logits'],
+                              dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}}, opset_version=17)
+            os.replace(fp32_path + '.tmp', fp32_path)
+        if backend == 'onnx':
+            return OnnxRuntimeEngine(fp32_path)
+        int8_path = _engine_artifact('places365.int8-qdq.onnx')
+        if not _artifact_is_fresh(int8_path, fp32_path): _quantize_places_static(fp32_path, int8_path, calibration_dir or PLACES_CALIBRATION_DIR)
+        return OnnxRuntimeEngine(int8_path)
+    raise ValueError(f"Unknown Places365 backend '{backend}' (expected one of {PLACES_BACKENDS})")
+
+def build_yolo_engine(backend):
+    """
+    Builds YOLO-World for a backend in YOLO_BACKENDS. 'onnx' / 'openvino' export the model
+    with TARGET_CLASSES baked in (dynamic batch/size, YOLO_EXPORT_IMGSZ) through ultralytics
+    and cache the artifact in ENGINE_CACHE_DIR, keyed by weights, vocabulary and image size.
+    Exported models have a fixed vocabulary, so focus mode falls back to filtering.
+    """
+    weights = model_path(YOLO_MODEL_FILE)
+    if backend not in YOLO_BACKENDS: raise ValueError(f"Unknown YOLO backend '{backend}' (expected one of {YOLO_BACKENDS})")
+    if backend == 'torch':
+        return load_yolo_model()
+    vocab_tag = hashlib.sha1('\n'.join(TARGET_CLASSES).encode('utf-8')).hexdigest()[:8]
+    stem = f"{os.path.splitext(YOLO_MODEL_FILE)[0]}_{vocab_tag}_{YOLO_EXPORT_IMGSZ}"
+    artifact = _engine_artifact(stem + ('.onnx' if backend == 'onnx' else '_openvino_model'))
+    if not _artifact_is_fresh(artifact, weights):
+        logger.info(f"Exporting YOLO-World to {backend} (imgsz {YOLO_EXPORT_IMGSZ})...")
+        exported = load_yolo_model().export(format=backend, imgsz=YOLO_EXPORT_IMGSZ, dynamic=True)
+        if os.path.isdir(artifact): shutil.rmtree(artifact)
+        shutil.move(str(exported), artifact)
+    return YOLO(artifact, task='detect')
+
+def _places_input(image_np, rgb=None):
+    """ BGR frame (or its already-converted RGB copy) -> normalized float32 (1, 3, 224, 224) numpy batch for Places365. """
+    img_rgb = rgb if rgb is not None else cv2.cvtColor(image_np, cv2.COLOR_BGR2RGB); img_pil = Image.fromarray(img_rgb)
+    return scene_transform(img_pil).unsqueeze(0).numpy()
+
+def _box_iou(a, b):
+    """ IoU of two normalized center/width/height box dicts. """
+    ax1, ay1, ax2, ay2 = a['center_x'] - a['width'] / 2, a['center_y'] - a['height'] / 2, a['center_x'] + a['width'] / 2, a['center_y'] + a['height'] / 2
+    bx1, by1, bx2, by2 = b['center_x'] - b['width'] / 2, b['center_y'] - b['height'] / 2, b['center_x'] + b['width'] / 2, b['center_y'] + b['height'] / 2
+    inter = max(0.0, min(ax2, bx2) - max(ax1, bx1)) * max(0.0, min(ay2, by2) - max(ay1, by1))
+    union = a['width'] * a['height'] + b['width'] * b['height'] - inter
+    return inter / union if union > 0 else 0.0
+
+def check_backend_accuracy(sample_dir, places_backends=PLACES_BACKENDS, yolo_backends=YOLO_BACKENDS, limit=200):
+    """
+    Accuracy-check mode: runs every backend over the images in sample_dir and compares
+    it with the PyTorch eager reference. Places365 reports top-1 agreement, top-5 overlap
+    and the max softmax difference; YOLO reports the fraction of reference detections
+    matched (same class, IoU >= 0.5). Both report mean and p95 latency per image.
+    onnx-int8 is calibrated on PLACES_CALIBRATION_DIR, or on sample_dir if unset.
+    """
+    images = _sample_images(sample_dir, limit)
+    if not images: raise ValueError(f"No readable images in {sample_dir}")
+    report = {'samples': len(images), 'places365': {}, 'yolo': {}}
+
+    def _softmax(logits):
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True)); return exp / exp.sum(axis=1, keepdims=True)
+    inputs = [_places_input(img) for img in images]
+    reference = None
+    for backend in places_backends:
+        try:
+            engine = build_places_engine(backend, calibration_dir=PLACES_CALIBRATION_DIR or sample_dir)
+            probs, timings = [], []
+            for x in inputs:
+                start = time.perf_counter(); logits = engine(x); timings.append(time.perf_counter() - start)
+                probs.append(_softmax(logits)[0])
+        except Exception as e:
+            report['places365'][backend] = {'error': str(e)}; continue
+        if reference is None: reference = probs # First backend (torch) is the reference
+        report['places365'][backend] = {
+            'top1_agreement': float(np.mean([p.argmax() == r.argmax() for p, r in zip(probs, reference)])),
+            'top5_overlap': float(np.mean([len(set(np.argsort(p)[-5:]) & set(np.argsort(r)[-5:])) / 5.0 for p, r in zip(probs, reference)])),
+            'max_prob_diff': float(max(np.abs(p - r).max() for p, r in zip(probs, reference))),
+            'mean_ms': round(float(np.mean(timings)) * 1000, 2),
+            'p95_ms': round(float(np.percentile(timings, 95)) * 1000, 2),
+        }
+
+    reference = None
+    for backend in yolo_backends:
+        try:
+            engine = build_yolo_engine(backend)
+            kwargs = {} if backend == 'torch' else {'imgsz': YOLO_EXPORT_IMGSZ}
+            detections, timings = [], []
+            for img in images:
+                start = time.perf_counter(); result = engine.predict(img, conf=OBJECT_DETECTION_CONFIDENCE, verbose=False, **kwargs)[0]; timings.append(time.perf_counter() - start)
+                detections.append([d for _, _, d in _parse_yolo_result(result)])
+        except Exception as e:
+            report['yolo'][backend] = {'error': str(e)}; continue
+        if reference is None: reference = detections
+        matched = total = 0
+        for dets, refs in zip(detections, reference):
+            unmatched = list(dets)
+            for ref in refs:
+                total += 1
+                match = next((d for d in unmatched if d['name'] == ref['name'] and _box_iou(d, ref) >= 0.5), None)
+                if match is not None: matched += 1; unmatched.remove(match)
+        report['yolo'][backend] = {'matched_reference_detections': (matched / total) if total else 1.0, 'mean_ms': round(float(np.mean(timings)) * 1000, 2),
+                                  'p95_ms': round(float(np.percentile(timings, 95)) * 1000, 2)}
+    return report
+
+
+def model_unavailable_result(error):
+    """ Client-facing result for a request whose model isn't ready. """
+    if error.state in ('pending', 'loading'):
+        return {'status': 'loading', 'message': f"Model '{error.name}' is loading, try again shortly"}
+    return {'status': 'error', 'message': f"Model '{error.name}' unavailable"}
+
+model_registry = ModelRegistry()
+model_registry.register('yolo', lambda: build_yolo_engine(YOLO_BACKEND))
+model_registry.register('places365', lambda: build_places_engine(PLACES_BACKEND))
+places_labels = load_places365_labels()
+
+
+# --- OCR Engine Pool ---
+class OcrLanguageError(Exception):
+    """ Raised when an OCR engine cannot be initialized for a language (e.g. missing traineddata). """
+
+class OcrEnginePool:
+    """
+    Pool of long-lived, in-process Tesseract engines (tesserocr.PyTessBaseAPI).
+
+    Unlike pytesseract, which writes a temp image and forks a `tesseract` process that
+    reloads the traineddata on every call, each engine here is initialized once per
+    language and fed grayscale numpy buffers directly. Engines are created lazily up to
+    the per-language pool size (OCR_POOL_SIZE / OCR_POOL_SIZES), and engines idle for
+    longer than idle_timeout seconds are shut down by a background reaper.
+    """
+    def __init__(self, default_size=OCR_POOL_SIZE, sizes=None, idle_timeout=OCR_POOL_IDLE_TIMEOUT_S):
+        self.default_size = max(1, int(default_size))
+        self.sizes = dict(sizes or {})
+        self.idle_timeout = float(idle_timeout)
+        self._cond = threading.Condition()
+        self._idle = {} # lang -> list of (last_used, engine)
+        self._created = {} # lang -> number of live engines (idle + in use)
+        self._failed_langs = set()
+        if self.idle_timeout > 0:
+            threading.Thread(target=self._reap_idle, name='ocr-pool-reaper', daemon=True).start()
+
+    def _size_for(self, lang):
+        return max(1, int(self.sizes.get(lang, self.default_size)))
+
+    def _create_engine(self, lang):
+        start = time.time()
+        try:
+            engine = tesserocr.PyTessBaseAPI(path=TESSDATA_PATH, lang=lang) if TESSDATA_PATH else tesserocr.PyTessBaseAPI(lang=lang)
+        except RuntimeError as e:
+            raise OcrLanguageError(f"Could not initialize Tesseract for '{lang}': {e}") from e
+        logger.info(f"OCR pool: started '{lang}' engine in {time.time() - start:.3f}s.")
+        return engine
+
+    def acquire(self, lang):
+        """ Returns an idle engine for lang, creating one if the pool is below its size, else waits. """
+        with self._cond:
+            if lang in self._failed_langs: raise OcrLanguageError(f"Tesseract language '{lang}' unavailable")
+            while True:
+                idle = self._idle.get(lang)
+                if idle: return idle.pop()[1]
+                if self._created.get(lang, 0) < self._size_for(lang):
+                    self._created[lang] = self._created.get(lang, 0) + 1
+                    break
+                self._cond.wait()
+        # Engine start-up (traineddata load) happens outside the lock.
+        try:
+            return self._create_engine(lang)
+        except Exception as e:
+            with self._cond:
+                self._created[lang] -= 1
+                if isinstance(e, OcrLanguageError): self._failed_langs.add(lang)
+                self._cond.notify_all()
+            raise
+
+    def release(self, lang, engine):
+        with self._cond:
+            self._idle.setdefault(lang, []).append((time.monotonic(), engine))
+            self._cond.notify()
+
+    def recognize(self, gray_np, lang, psm=None):
+        """ Runs OCR on a 2-D uint8 numpy image (optionally with a page segmentation mode) and returns the raw UTF-8 text. """
+        gray_np = np.ascontiguousarray(gray_np)
+        height, width = gray_np.shape[:2]
+        engine = self.acquire(lang)
+        default_psm = engine.GetPageSegMode()
+        try:
+            if psm is not None: engine.SetPageSegMode(psm)
+            engine.SetImageBytes(gray_np.tobytes(), width, height, 1, width)
+            return engine.GetUTF8Text()
+        finally:
+            engine.Clear()
+            if psm is not None: engine.SetPageSegMode(default_psm)
+            self.release(lang, engine)
+
+    def warm_up(self, langs):
+        """ Starts one engine per language in the background so the first request doesn't pay for it. """
+        def _warm():
+            for lang in langs:
+                try: self.release(lang, self.acquire(lang))
+                except Exception as e: logger.warning(f"OCR pool warm-up failed for '{lang}': {e}")
+        threading.Thread(target=_warm, name='ocr-pool-warmup', daemon=True).start()
+
+    def _reap_idle(self):
+        while True:
+            time.sleep(min(30.0, self.idle_timeout))
+            expired = []
+            now = time.monotonic()
+            with self._cond:
+                for lang, idle in self._idle.items():
+                    keep = [(last_used, engine) for last_used, engine in idle if now - last_used <= self.idle_timeout]
+                    expired.extend((lang, engine) for last_used, engine in idle if now - last_used > self.idle_timeout)
+                    self._idle[lang] = keep
+                for lang, _ in expired: self._created[lang] -= 1
+            for lang, engine in expired:
+                engine.End()
+                logger.info(f"OCR pool: stopped idle '{lang}' engine.")
 
-    # --- Tesseract Supported Languages ---
-    SUPPORTED_OCR_LANGS = {'eng', 'ara', 'fas', 'urd', 'uig', 'hin', 'mar', 'nep', 'rus','chi_sim', 'chi_tra', 'jpn', 'kor', 'tel', 'kan', 'ben'}
-    DEFAULT_OCR_LANG = 'eng'
-    logger.info(f"Tesseract OCR: Supported={SUPPORTED_OCR_LANGS}, Default={DEFAULT_OCR_LANG}")
+    def stats(self):
+        with self._cond:
+            return {lang: {'engines': count, 'idle': len(self._idle.get(lang, [])), 'size': self._size_for(lang)} for lang, count in self._created.items()}
 
-    # --- Image Transforms for Scene Classification ---
-    scene_transform = transforms.Compose([transforms.Resize((256, 256)), transforms.CenterCrop(224), transforms.ToTensor(), transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])])
+def _parse_pool_sizes(spec):
+    """ Parses 'eng:4,ara:1' into {'eng': 4, 'ara': 1}. """
+    sizes = {}
+    for part in spec.split(','):
+        if ':' in part:
+            lang, size = part.split(':', 1)
+            try: sizes[lang.strip()] = int(size)
+            except ValueError: logger.warning(f"Ignoring invalid OCR_POOL_SIZES entry '{part}'.")
+    return sizes
 
-    logger.info("All ML models loaded.")
+ocr_pool = None
+if OCR_ENGINE == 'pool':
+    if tesserocr is None:
+        logger.warning("OCR_ENGINE=pool but tesserocr is not installed; falling back to pytesseract subprocesses.")
+    else:
+        ocr_pool = OcrEnginePool(sizes=_parse_pool_sizes(OCR_POOL_SIZES))
+logger.info(f"OCR engine: {'in-process pool (tesserocr)' if ocr_pool else 'pytesseract subprocess'}")
 
-except Exception as e: logger.critical(f"FATAL ERROR DURING MODEL LOADING: {e}", exc_info=True); sys.exit(f"Model load failed: {e}")
+# Recent OCR call latencies per language, for before/after comparisons of the OCR engines
+ocr_latencies = {}
+ocr_latencies_lock = threading.Lock()
+
+def record_ocr_latency(lang, seconds):
+    with ocr_latencies_lock:
+        ocr_latencies.setdefault(lang, deque(maxlen=1000)).append(seconds)
+
+def ocr_latency_stats():
+    """ Count, p50, p99 and throughput (calls per busy second) of recent text_detection OCR passes per language (all regions of a frame count as one). """
+    with ocr_latencies_lock:
+        snapshot = {lang: sorted(samples) for lang, samples in ocr_latencies.items()}
+    stats = {}
+    for lang, samples in snapshot.items():
+        if not samples: continue
+        stats[lang] = {
+            'calls': len(samples),
+            'p50_ms': round(samples[int(0.50 * (len(samples) - 1))] * 1000, 2),
+            'p99_ms': round(samples[int(0.99 * (len(samples) - 1))] * 1000, 2),
+            'calls_per_busy_s': round(len(samples) / sum(samples), 2) if sum(samples) > 0 else None,
+        }
+    return stats
+
+def run_ocr(gray_np, lang, psm=None):
+    """ OCRs a grayscale numpy image with the configured engine and returns the stripped text. """
+    if ocr_pool is not None:
+        text = ocr_pool.recognize(gray_np, lang, psm=psm)
+    else:
+        text = pytesseract.image_to_string(gray_np, lang=lang, config=f'--psm {psm}' if psm is not None else '')
+    return text.strip()
+
+
+# --- Text Localization ---
+def _merge_boxes(boxes, gap):
+    """ Repeatedly merges (x1, y1, x2, y2) boxes that overlap or lie within `gap` pixels of each other. """
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for box in boxes:
+            for i, other in enumerate(out):
+                if box[0] <= other[2] + gap and other[0] <= box[2] + gap and box[1] <= other[3] + gap and other[1] <= box[3] + gap:
+                    out[i] = (min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3]))
+                    merged = True
+                    break
+            else:
+                out.append(box)
+        boxes = out
+    return boxes
+
+def locate_text_regions(gray):
+    """
+    Finds candidate text regions in a grayscale frame using a morphological gradient:
+    strokes light up in the gradient, Otsu thresholding keeps them, and a horizontal
+    closing joins characters into words/lines. Candidate boxes are filtered by size and
+    fill ratio, merged with nearby boxes and returned largest-first as (x1, y1, x2, y2)
+    in full-resolution pixel coordinates (at most TEXT_MAX_REGIONS).
+    """
+    frame_h, frame_w = gray.shape[:2]
+    scale = min(1.0, TEXT_LOCALIZATION_WIDTH / frame_w)
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    small_h, small_w = small.shape[:2]
+
+    gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    connected = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+    contours, _ = cv2.findContours(connected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        # Too small to hold a glyph, taller than half the frame, or a thin vertical edge.
+        if w < 8 or h < 6 or h > 0.5 * small_h or h > 3 * w:
+            continue
+        # Text lines are densely filled after closing; sparse boxes are usually texture/edges.
+        if cv2.countNonZero(connected[y:y + h, x:x + w]) / float(w * h) < 0.45:
+            continue
+        boxes.append((x, y, x + w, y + h))
+    if not boxes:
+        return []
+
+    boxes = _merge_boxes(boxes, gap=max(2, int(TEXT_REGION_MERGE_GAP * small_w)))
+    boxes.sort(key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)
+    # Back to full resolution, with a little padding so glyph edges aren't clipped.
+    pad = 4
+    return [
+        (max(0, int(x1 / scale) - pad), max(0, int(y1 / scale) - pad), min(frame_w, int(x2 / scale) + pad), min(frame_h, int(y2 / scale) + pad))
+        for x1, y1, x2, y2 in boxes[:TEXT_MAX_REGIONS]
+    ]
+
+def _binarize_crop(crop):
+    """ Otsu-binarizes a grayscale crop to dark text on a white background. """
+    _, binary = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    return binary if cv2.mean(binary)[0] >= 127 else cv2.bitwise_not(binary)
+
+def _ocr_stacked_regions(crops, lang, pad=16):
+    """
+    OCRs all crops in one Tesseract call by stacking them vertically on a white canvas,
+    then maps each recognized word back to its crop by vertical position. Used on the
+    pytesseract path, where every call pays a process start and traineddata load.
+    """
+    canvas = np.full((sum(c.shape[0] + pad for c in crops) + pad, max(c.shape[1] for c in crops) + 2 * pad), 255, dtype=np.uint8)
+    bands, top = [], pad
+    for crop in crops:
+        canvas[top:top + crop.shape[0], pad:pad + crop.shape[1]] = crop
+        bands.append((top, top + crop.shape[0])); top += crop.shape[0] + pad
+    data = pytesseract.image_to_data(canvas, lang=lang, config=f'--psm {OCR_REGION_PSM}', output_type=pytesseract.Output.DICT)
+    lines = [OrderedDict() for _ in crops] # per crop: (block, par, line) -> words
+    for i, word in enumerate(data['text']):
+        if not word.strip(): continue
+        center_y = data['top'][i] + data['height'][i] / 2.0
+        for index, (band_top, band_bottom) in enumerate(bands):
+            if band_top - pad / 2 <= center_y < band_bottom + pad / 2:
+                lines[index].setdefault((data['block_num'][i], data['par_num'][i], data['line_num'][i]), []).append(word)
+                break
+    return ['\n'.join(' '.join(words) for words in crop_lines.values()) for crop_lines in lines]
+
+def ocr_regions(crops, lang):
+    """
+    OCRs binarized region crops and returns one text per crop. Pool engines OCR each crop
+    as a single block; the subprocess path OCRs all crops stacked into one image. The one
+    entry point for region OCR, so the benchmark stubs can replace it alongside run_ocr.
+    """
+    if ocr_pool is not None: return [run_ocr(crop, lang, psm=OCR_REGION_PSM) for crop in crops]
+    return _ocr_stacked_regions(crops, lang)
+
+def _ocr_text_regions(gray, regions, lang):
+    """
+    OCRs the region crops (Otsu-binarized) and returns (joined_text, region_results) with
+    regions in reading order. region_results use the normalized box schema of
+    detect_objects plus the region's 'text'.
+    """
+    frame_h, frame_w = gray.shape[:2]
+    boxes = sorted(regions, key=lambda b: (b[1], b[0]))
+    crops = [_binarize_crop(gray[y1:y2, x1:x2]) for x1, y1, x2, y2 in boxes]
+    crop_texts = ocr_regions(crops, lang)
+    texts, region_results = [], []
+    for (x1, y1, x2, y2), text in zip(boxes, crop_texts):
+        text = text.strip()
+        if not text: continue
+        texts.append(text)
+        region_results.append({
+            'text': text,
+            'center_x': (x1 + x2) / 2.0 / frame_w,
+            'center_y': (y1 + y2) / 2.0 / frame_h,
+            'width': (x2 - x1) / frame_w,
+            'height': (y2 - y1) / frame_h,
+        })
+    return '\n'.join(texts), region_results
 
 
 # --- Detection Functions ---
 
+# Serializes access to yolo_model: the batch scheduler and any direct detect_objects()
+# callers must not run predict() on the shared model concurrently, and the active
+# vocabulary (see apply_yolo_vocabulary) must not change under a running predict().
+yolo_lock = threading.Lock()
+# Serializes CLIP text-encoder passes for new vocabularies without blocking predict().
+text_encoder_lock = threading.Lock()
+
+# --- Open-Vocabulary Class Sets ---
+class ClassEmbeddingCache:
+    """
+    LRU cache of YOLO-World class-text embeddings keyed by the (ordered) class tuple.
+
+    Computing embeddings runs the CLIP text encoder, which is far more expensive than
+    swapping a cached tensor back into the model. Memory is bounded both by the number
+    of cached vocabularies and by the total number of class embeddings held.
+    """
+    def __init__(self, max_entries=CLASS_EMBEDDING_CACHE_MAX_ENTRIES, max_classes=CLASS_EMBEDDING_CACHE_MAX_CLASSES):
+        self.max_entries = max(1, int(max_entries))
+        self.max_classes = max(1, int(max_classes))
+        self._entries = OrderedDict() # classes tuple -> txt_feats tensor
+        self._total_classes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, classes):
+        with self._lock:
+            feats = self._entries.get(classes)
+            if feats is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(classes)
+            self.hits += 1
+            return feats
+
+    def put(self, classes, feats):
+        with self._lock:
+            if classes in self._entries:
+                self._entries.move_to_end(classes)
+                return
+            self._entries[classes] = feats
+            self._total_classes += len(classes)
+            # Evict least recently used vocabularies, but always keep the newest one.
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._total_classes > self.max_classes):
+                evicted, _ = self._entries.popitem(last=False)
+                self._total_classes -= len(evicted)
+
+    def __contains__(self, classes):
+        with self._lock: return classes in self._entries
+
+    def stats(self):
+        with self._lock:
+            return {'vocabularies': len(self._entries), 'classes': self._total_classes, 'hits': self.hits, 'misses': self.misses}
+
+class_embedding_cache = ClassEmbeddingCache()
+DEFAULT_YOLO_VOCABULARY = tuple(TARGET_CLASSES)
+_active_yolo_vocabulary = DEFAULT_YOLO_VOCABULARY # Set on yolo_model at load time
+
+def focus_vocabulary(focus_object):
+    """
+    Returns the class set used for a focus request: the focus object plus a few
+    distractor classes, which give the open-vocabulary head something to compare
+    against. Falls back to the full TARGET_CLASSES when FOCUS_SMALL_VOCABULARY is off or
+    the YOLO backend is an exported (fixed-vocabulary) model.
+    """
+    if not FOCUS_SMALL_VOCABULARY or not focus_object or YOLO_BACKEND != 'torch':
+        return DEFAULT_YOLO_VOCABULARY
+    focus_class = focus_object.strip().lower()
+    return (focus_class,) + tuple(c for c in FOCUS_DISTRACTOR_CLASSES if c != focus_class)
+
+def vocabulary_cached(classes):
+    """ True if switching to `classes` needs no text-encoder pass. """
+    return classes == _active_yolo_vocabulary or classes in class_embedding_cache
+
+def compute_class_embeddings(yolo_model, classes):
+    """
+    Encodes `classes` with the CLIP text encoder into class_embedding_cache and returns the
+    embeddings. Runs without yolo_lock, so encoding a new vocabulary doesn't stall predict()
+    for everyone else. Returns None when this ultralytics version has no get_text_pe(),
+    in which case apply_yolo_vocabulary() falls back to set_classes() under the lock.
+    """
+    world_model = yolo_model.model
+    if not hasattr(world_model, 'get_text_pe'): return None
+    with text_encoder_lock:
+        feats = class_embedding_cache.get(classes) if classes in class_embedding_cache else None
+        if feats is None:
+            start = time.time()
+            feats = world_model.get_text_pe(list(classes))
+            class_embedding_cache.put(classes, feats)
+            logger.debug(f"Computed YOLO-World embeddings for {len(classes)} classes in {time.time() - start:.3f}s.")
+        return feats
+
+def prepare_focus_vocabulary(focus_object):
+    """
+    Encodes a focus request's vocabulary in the calling (per-session) thread before the
+    frame reaches the shared batcher. Raises ModelNotReady while YOLO is loading.
+    """
+    classes = focus_vocabulary(focus_object)
+    if YOLO_BACKEND == 'torch' and not vocabulary_cached(classes):
+        compute_class_embeddings(model_registry.get('yolo'), classes)
+
+def apply_yolo_vocabulary(yolo_model, classes, feats=None):
+    """
+    Makes `classes` the active YOLO-World vocabulary, using `feats` or cached text
+    embeddings when available. Must be called with yolo_lock held.
+    """
+    global _active_yolo_vocabulary
+    if classes == _active_yolo_vocabulary:
+        return
+    world_model = yolo_model.model
+    # Keep the outgoing vocabulary's embeddings so switching back is cheap.
+    if _active_yolo_vocabulary not in class_embedding_cache and getattr(world_model, 'txt_feats', None) is not None:
+        class_embedding_cache.put(_active_yolo_vocabulary, world_model.txt_feats)
+
+    if feats is None: feats = class_embedding_cache.get(classes)
+    if feats is None:
+        start = time.time()
+        yolo_model.set_classes(list(classes)) # Runs the text encoder (older ultralytics without get_text_pe)
+        class_embedding_cache.put(classes, world_model.txt_feats)
+        logger.debug(f"Computed YOLO-World embeddings for {len(classes)} classes in {time.time() - start:.3f}s.")
+    else:
+        # Same state ultralytics' set_classes() leaves behind, minus the text encoder pass.
+        world_model.txt_feats = feats
+        world_model.model[-1].nc = len(classes)
+        world_model.names = list(classes)
+        if yolo_model.predictor: yolo_model.predictor.model.names = dict(enumerate(classes))
+    _active_yolo_vocabulary = classes
+
+
+def _parse_yolo_result(result):
+    """
+    Converts a single ultralytics Results object into (confidence, name, box_details) tuples.
+    Box coordinates are normalized to the frame size.
+    """
+    all_detections = [] # Store (confidence, name, box_details) tuples
+    if result is None or not result.boxes:
+        return all_detections
+
+    boxes = result.boxes
+    class_id_to_name = result.names
+    if isinstance(class_id_to_name, (list, tuple)): # set_classes() can leave a plain list behind
+        class_id_to_name = dict(enumerate(class_id_to_name))
+
+    for box in boxes:
+        confidence = float(box.conf[0])
+        class_id = int(box.cls[0])
+
+        if class_id in class_id_to_name:
+            class_name = class_id_to_name[class_id]
+            # Get normalized bounding box coordinates [x1, y1, x2, y2]
+            norm_box = box.xyxyn[0].tolist() # Use .tolist() for JSON compatibility
+            # Calculate center, width, height (normalized)
+            x1, y1, x2, y2 = norm_box
+            center_x = (x1 + x2) / 2.0
+            center_y = (y1 + y2) / 2.0
+            width = x2 - x1
+            height = y2 - y1
+            box_details = {
+                'name': class_name,
+                'confidence': confidence,
+                'center_x': center_x,
+                'center_y': center_y,
+                'width': width,
+                'height': height
+            }
+            all_detections.append((confidence, class_name, box_details))
+        else:
+            logger.warning(f"Unknown class ID {class_id} detected.")
+    return all_detections
+
+def _select_detections(all_detections, focus_object=None):
+    """ Applies focus-mode filtering or normal-mode top-N selection to parsed detections. """
+    # --- Handle Focus Mode ---
+    if focus_object:
+        focus_object_lower = focus_object.lower()
+        found_focus_detections = []
+        for conf, name, details in all_detections:
+            if name.lower() == focus_object_lower:
+                found_focus_detections.append((conf, details)) # Store confidence and full details
+
+        if not found_focus_detections:
+            logger.debug(f"Focus mode: '{focus_object}' not found.")
+            return {'status': 'not_found'}
+        else:
+            # Sort the *found* focus objects by confidence and take the best one
+            found_focus_detections.sort(key=lambda x: x[0], reverse=True)
+            best_focus_conf, best_focus_details = found_focus_detections[0]
+            logger.debug(f"Focus mode: Found '{focus_object}' (Conf: {best_focus_conf:.3f}) at center ({best_focus_details['center_x']:.2f}, {best_focus_details['center_y']:.2f})")
+            return {'status': 'found', 'detection': best_focus_details}
+    # --- --- --- --- --- --- ---
+
+    # --- Handle Normal Mode (No focus_object) ---
+    else:
+        if not all_detections:
+            logger.debug("Normal mode: No objects detected.")
+            return {'status': 'none'}
+        else:
+            # Sort all detections by confidence
+            all_detections.sort(key=lambda x: x[0], reverse=True)
+            # Limit the number of results
+            top_detections_data = [details for conf, name, details in all_detections[:MAX_OBJECTS_TO_RETURN]]
+
+            # Log details (optional)
+            log_summary = ", ".join([f"{d['name']}({d['confidence']:.2f})" for d in top_detections_data])
+            logger.debug(f"Normal mode: Top {len(top_detections_data)} results: {log_summary}")
+
+            return {'status': 'ok', 'detections': top_detections_data}
+    # --- --- --- --- --- --- --- ---
+
+def detect_objects_batch(images_np, focus_objects=None, classes=None, imgsz=None):
+    """
+    Runs YOLO-World once over a list of frames and post-processes each frame independently.
+
+    Args:
+        images_np (list[numpy.ndarray]): Input images in BGR format.
+        focus_objects (list[str | None], optional): Per-frame focus object (None for normal mode).
+        classes (tuple[str], optional): Vocabulary to predict with, shared by the whole batch.
+            Defaults to focus_vocabulary() of the first frame.
+        imgsz (int, optional): YOLO input size for the torch backend. Defaults to YOLO_IMGSZ.
+
+    Returns:
+        list[dict]: One result dict per input frame, same structure as detect_objects().
+    """
+    if focus_objects is None:
+        focus_objects = [None] * len(images_np)
+    if classes is None:
+        classes = focus_vocabulary(focus_objects[0]) if focus_objects else DEFAULT_YOLO_VOCABULARY
+    metric_type = 'focus_detection' if focus_objects and focus_objects[0] else 'object_detection'
+    try:
+        yolo_model = model_registry.get('yolo')
+    except ModelNotReady as e:
+        return [model_unavailable_result(e) for _ in images_np]
+    try:
+        # Focus frames predict against a small vocabulary (focus object + distractors),
+        # normal frames against TARGET_CLASSES; filtering still happens *after* prediction.
+        # Ultralytics takes BGR numpy arrays directly (like cv2.imread output),
+        # so there is no need for the BGR -> RGB -> PIL round trip here.
+        feats = None
+        if YOLO_BACKEND == 'torch' and not vocabulary_cached(classes):
+            # New vocabularies are encoded before taking yolo_lock so other batches keep running.
+            with stage_timer(metric_type, 'vocabulary'): feats = compute_class_embeddings(yolo_model, classes)
+        with yolo_lock:
+            predict_kwargs = {}
+            with stage_timer(metric_type, 'vocabulary'):
+                if YOLO_BACKEND == 'torch': apply_yolo_vocabulary(yolo_model, classes, feats); predict_kwargs['imgsz'] = imgsz or YOLO_IMGSZ
+                else: predict_kwargs['imgsz'] = YOLO_EXPORT_IMGSZ
+            with stage_timer(metric_type, 'inference'):
+                results = yolo_model.predict(list(images_np), conf=OBJECT_DETECTION_CONFIDENCE, verbose=False, **predict_kwargs)
+        if METRICS_ENABLED: yolo_batch_frames.observe(len(images_np))
+    except Exception as e:
+        logger.error(f"Error during batched object detection ({len(images_np)} frames): {e}", exc_info=True)
+        errors_total.inc((metric_type, 'inference'))
+        return [{'status': 'error', 'message': "Error in object detection"} for _ in images_np]
+
+    batch_results = []
+    with stage_timer(metric_type, 'postprocess'):
+        for i, focus_object in enumerate(focus_objects):
+            try:
+                result = results[i] if results and i < len(results) else None
+                batch_results.append(_select_detections(_parse_yolo_result(result), focus_object))
+            except Exception as e:
+                logger.error(f"Error during object detection post-processing (Focus: {focus_object}): {e}", exc_info=True)
+                errors_total.inc((metric_type, 'postprocess'))
+                batch_results.append({'status': 'error', 'message': "Error in object detection"})
+    return batch_results
+
 def detect_objects(image_np, focus_object=None):
     """
     Detects objects using YOLO-World.
@@ -154,210 +1268,1343 @@ def detect_objects(image_np, focus_object=None):
               - No objects detected: {'status': 'none'}
               - Error: {'status': 'error', 'message': str}
     """
-    try:
-        img_rgb = cv2.cvtColor(image_np, cv2.COLOR_BGR2RGB)
-        img_pil = Image.fromarray(img_rgb)
-
-        # --- Perform inference ---
-        # Note: We predict for all TARGET_CLASSES even in focus mode.
-        # Filtering happens *after* prediction. This is generally more robust
-        # for open-vocabulary models than constantly changing the target class list.
-        results = yolo_model.predict(img_pil, conf=OBJECT_DETECTION_CONFIDENCE, verbose=False)
-
-        all_detections = [] # Store (confidence, name, box_details) tuples
-
-        # --- Process raw detections ---
-        if results and results[0].boxes:
-            boxes = results[0].boxes
-            class_id_to_name = results[0].names
-
-            for box in boxes:
-                confidence = float(box.conf[0])
-                class_id = int(box.cls[0])
-
-                if class_id in class_id_to_name:
-                    class_name = class_id_to_name[class_id]
-                    # Get normalized bounding box coordinates [x1, y1, x2, y2]
-                    norm_box = box.xyxyn[0].tolist() # Use .tolist() for JSON compatibility
-                    # Calculate center, width, height (normalized)
-                    x1, y1, x2, y2 = norm_box
-                    center_x = (x1 + x2) / 2.0
-                    center_y = (y1 + y2) / 2.0
-                    width = x2 - x1
-                    height = y2 - y1
-                    box_details = {
-                        'name': class_name,
-                        'confidence': confidence,
-                        'center_x': center_x,
-                        'center_y': center_y,
-                        'width': width,
-                        'height': height
-                    }
-                    all_detections.append((confidence, class_name, box_details))
-                else:
-                    logger.warning(f"Unknown class ID {class_id} detected.")
-        # --- --- --- --- --- --- --- ---
-
-        # --- Handle Focus Mode ---
-        if focus_object:
-            focus_object_lower = focus_object.lower()
-            found_focus_detections = []
-            for conf, name, details in all_detections:
-                if name.lower() == focus_object_lower:
-                    found_focus_detections.append((conf, details)) # Store confidence and full details
-
-            if not found_focus_detections:
-                logger.debug(f"Focus mode: '{focus_object}' not found.")
-                return {'status': 'not_found'}
-            else:
-                # Sort the *found* focus objects by confidence and take the best one
-                found_focus_detections.sort(key=lambda x: x[0], reverse=True)
-                best_focus_conf, best_focus_details = found_focus_detections[0]
-                logger.debug(f"Focus mode: Found '{focus_object}' (Conf: {best_focus_conf:.3f}) at center ({best_focus_details['center_x']:.2f}, {best_focus_details['center_y']:.2f})")
-                return {'status': 'found', 'detection': best_focus_details}
-        # --- --- --- --- --- --- ---
-
-        # --- Handle Normal Mode (No focus_object) ---
-        else:
-            if not all_detections:
-                logger.debug("Normal mode: No objects detected.")
-                return {'status': 'none'}
-            else:
-                # Sort all detections by confidence
-                all_detections.sort(key=lambda x: x[0], reverse=True)
-                # Limit the number of results
-                top_detections_data = [details for conf, name, details in all_detections[:MAX_OBJECTS_TO_RETURN]]
+    return detect_objects_batch([image_np], [focus_object])[0]
 
-                # Log details (optional)
-                log_summary = ", ".join([f"{d['name']}({d['confidence']:.2f})" for d in top_detections_data])
-                logger.debug(f"Normal mode: Top {len(top_detections_data)} results: {log_summary}")
-
-                return {'status': 'ok', 'detections': top_detections_data}
-        # --- --- --- --- --- --- --- ---
-
-    except Exception as e:
-        logger.error(f"Error during object detection (Focus: {focus_object}): {e}", exc_info=True)
-        return {'status': 'error', 'message': "Error in object detection"}
 
 # (Keep detect_scene and detect_text functions as they were in the previous version)
-def detect_scene(image_np):
-    """ Classifies the scene using Places365 model. """
+def detect_scene(image_np, rgb=None):
+    """ Classifies the scene using the Places365 engine (PLACES_BACKEND). Raises ModelNotReady until it is loaded. """
+    places_engine = model_registry.get('places365')
     try:
-        img_rgb = cv2.cvtColor(image_np, cv2.COLOR_BGR2RGB); img_pil = Image.fromarray(img_rgb); img_tensor = scene_transform(img_pil).unsqueeze(0)
-        with torch.no_grad(): outputs = places_model(img_tensor); probabilities = torch.softmax(outputs, dim=1)[0]; top_prob, top_catid = torch.max(probabilities, 0)
+        with stage_timer('scene_detection', 'preprocess'): places_input = _places_input(image_np, rgb=rgb)
+        with stage_timer('scene_detection', 'inference'): outputs = torch.from_numpy(places_engine(places_input))
+        probabilities = torch.softmax(outputs, dim=1)[0]; top_prob, top_catid = torch.max(probabilities, 0)
         if top_catid.item() < len(places_labels): predicted_label = places_labels[top_catid.item()]; confidence = top_prob.item(); result_str = f"{predicted_label}"; logger.debug(f"Scene: {predicted_label} (Conf: {confidence:.3f})"); return result_str
         else: logger.warning(f"Places365 ID {top_catid.item()} out of bounds."); return "Unknown Scene"
-    except Exception as e: logger.error(f"Scene detection error: {e}", exc_info=True); return "Error in scene detection"
-def detect_text(image_np, language_code=DEFAULT_OCR_LANG):
-    """ Performs OCR using Tesseract. """
+    except Exception as e: logger.error(f"Scene detection error: {e}", exc_info=True); errors_total.inc(('scene_detection', 'inference')); return "Error in scene detection"
+def detect_text(image_np, language_code=DEFAULT_OCR_LANG, with_regions=False, gray=None):
+    """
+    Performs OCR using Tesseract (in-process engine pool, or pytesseract subprocess).
+
+    With TEXT_REGION_DETECTION enabled, candidate text regions are located first and only
+    those crops are OCR'd; a frame with no candidate region returns "No text detected"
+    without invoking Tesseract. If with_regions is True, returns (text, regions) where
+    regions lists the per-region boxes (empty when OCR ran on the full frame). A grayscale
+    copy of the frame that was already computed can be passed as gray.
+    """
+    regions = []
+    def _result(text): return (text, regions) if with_regions else text
+    def _ocr(lang):
+        nonlocal regions
+        start = time.time()
+        with stage_timer('text_detection', 'ocr'):
+            if boxes is None: text = run_ocr(img_gray, lang)
+            else: text, regions = _ocr_text_regions(img_gray, boxes, lang)
+        record_ocr_latency(lang, time.time() - start) # Per text_detection call, whatever the number of regions
+        return text
+
     logger.debug(f"Starting Tesseract OCR for lang: '{language_code}'..."); validated_lang = language_code if language_code in SUPPORTED_OCR_LANGS else DEFAULT_OCR_LANG
     if validated_lang != language_code: logger.warning(f"Lang '{language_code}' invalid/unsupported, using '{DEFAULT_OCR_LANG}'.")
     try:
-        img_rgb = cv2.cvtColor(image_np, cv2.COLOR_BGR2RGB); img_pil = Image.fromarray(img_rgb); detected_text = pytesseract.image_to_string(img_pil, lang=validated_lang); result_str = detected_text.strip()
-        if not result_str: logger.debug(f"Tesseract ({validated_lang}): No text."); return "No text detected"
-        else: log_text = result_str.replace('\n', ' ').replace('\r', '')[:100]; logger.debug(f"Tesseract ({validated_lang}) OK: Found '{log_text}...'"); return result_str
-    except pytesseract.TesseractNotFoundError: logger.error("Tesseract not found."); return "Error: OCR Engine Not Found"
-    except pytesseract.TesseractError as tess_e:
-        logger.error(f"TesseractError ({validated_lang}): {tess_e}", exc_info=False); error_str = str(tess_e).lower()
-        if "failed loading language" in error_str or "could not initialize tesseract" in error_str:
-             logger.warning(f"Missing lang pack for '{validated_lang}'?");
-             if validated_lang != DEFAULT_OCR_LANG:
-                 logger.warning(f"Attempting fallback OCR with '{DEFAULT_OCR_LANG}'...");
-                 try: img_rgb_fallback = cv2.cvtColor(image_np, cv2.COLOR_BGR2RGB); img_pil_fallback = Image.fromarray(img_rgb_fallback); fallback_text = pytesseract.image_to_string(img_pil_fallback, lang=DEFAULT_OCR_LANG); fallback_result = fallback_text.strip()
-                 except Exception as fallback_e: logger.error(f"Fallback OCR error: {fallback_e}"); return "Error during OCR fallback"
-                 if not fallback_result: return "No text detected (fallback)"
-                 else: log_fallback_text = fallback_result.replace('\n', ' ').replace('\r', '')[:100]; logger.debug(f"Tesseract fallback OK: '{log_fallback_text}...'"); return fallback_result
-             else: return f"Error: OCR failed for '{validated_lang}'"
-        else: return f"Error during text detection ({validated_lang})"
-    except Exception as e: logger.error(f"Unexpected OCR error ({validated_lang}): {e}", exc_info=True); return f"Error during text detection ({validated_lang})"
+        # Convert once; region crops and the fallback below reuse the same grayscale buffer.
+        with stage_timer('text_detection', 'preprocess'): img_gray = gray if gray is not None else to_gray(image_np)
+        with stage_timer('text_detection', 'localization'): boxes = locate_text_regions(img_gray) if TEXT_REGION_DETECTION else None
+        if boxes is not None and not boxes: logger.debug("Text localization: no candidate regions."); return _result("No text detected")
+        try:
+            result_str = _ocr(validated_lang)
+        except (OcrLanguageError, pytesseract.TesseractError) as lang_e:
+            logger.error(f"TesseractError ({validated_lang}): {lang_e}", exc_info=False); error_str = str(lang_e).lower()
+            if isinstance(lang_e, OcrLanguageError) or "failed loading language" in error_str or "could not initialize tesseract" in error_str:
+                logger.warning(f"Missing lang pack for '{validated_lang}'?")
+                if validated_lang != DEFAULT_OCR_LANG:
+                    logger.warning(f"Attempting fallback OCR with '{DEFAULT_OCR_LANG}'...")
+                    try: fallback_result = _ocr(DEFAULT_OCR_LANG)
+                    except Exception as fallback_e: logger.error(f"Fallback OCR error: {fallback_e}"); return _result("Error during OCR fallback")
+                    if not fallback_result: return _result("No text detected (fallback)")
+                    else: log_fallback_text = fallback_result.replace('\n', ' ').replace('\r', '')[:100]; logger.debug(f"Tesseract fallback OK: '{log_fallback_text}...'"); return _result(fallback_result)
+                else: return _result(f"Error: OCR failed for '{validated_lang}'")
+            else: return _result(f"Error during text detection ({validated_lang})")
+        if not result_str: logger.debug(f"Tesseract ({validated_lang}): No text."); return _result("No text detected")
+        else: log_text = result_str.replace('\n', ' ').replace('\r', '')[:100]; logger.debug(f"Tesseract ({validated_lang}) OK: Found '{log_text}...'"); return _result(result_str)
+    except pytesseract.TesseractNotFoundError: logger.error("Tesseract not found."); return _result("Error: OCR Engine Not Found")
+    except Exception as e: logger.error(f"Unexpected OCR error ({validated_lang}): {e}", exc_info=True); errors_total.inc(('text_detection', 'ocr')); return _result(f"Error during text detection ({validated_lang})")
+
+
+# --- Cross-Client Micro-Batching ---
+_PendingFrame = namedtuple('_PendingFrame', ['enqueued', 'image', 'focus_object', 'imgsz', 'future'])
+
+class ObjectDetectionBatcher:
+    """
+    Collects pending object/focus detection frames from all client sessions and runs
+    them through YOLO-World as a single batch on a dedicated thread.
+
+    A batch is closed when max_batch_size frames are pending or when the oldest
+    pending frame has waited max_wait_ms, whichever comes first. Each caller gets a
+    Future resolving to its own result dict, so the SocketIO handler thread can emit
+    it back to the originating request.sid.
+    """
+    def __init__(self, max_batch_size=YOLO_BATCH_MAX_SIZE, max_wait_ms=YOLO_BATCH_MAX_WAIT_MS):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._pending = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='yolo-batcher', daemon=True)
+        self._thread.start()
+        logger.info(f"Object detection batcher started (max batch: {self.max_batch_size}, max wait: {self.max_wait * 1000:.1f}ms).")
+
+    def submit(self, image_np, focus_object=None, imgsz=None):
+        """ Queues a frame for the next batch. Returns a Future with the detect_objects()-style result. """
+        future = Future()
+        self._pending.put(_PendingFrame(time.monotonic(), image_np, focus_object, imgsz, future))
+        return future
+
+    def pending(self):
+        """ Approximate number of frames waiting for the next batch. """
+        return self._pending.qsize()
+
+    def _collect_batch(self):
+        """ Blocks for the first frame, then gathers more until the batch is full or the wait window closes. """
+        first = self._pending.get()
+        batch = [first]
+        deadline = first.enqueued + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Always drain frames that are already queued, even if the window has closed.
+                batch.append(self._pending.get(timeout=remaining) if remaining > 0 else self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                # Frames sharing a vocabulary and input size run as one predict() call.
+                groups = OrderedDict()
+                for item in batch:
+                    groups.setdefault((focus_vocabulary(item.focus_object), item.imgsz), []).append(item)
+                for (classes, imgsz), group in groups.items():
+                    results = detect_objects_batch([item.image for item in group], [item.focus_object for item in group], classes=classes, imgsz=imgsz)
+                    for item, result in zip(group, results):
+                        item.future.set_result(result)
+                logger.debug(f"Batcher: ran {len(batch)} frame(s) in {len(groups)} vocabulary group(s), oldest waited {(time.monotonic() - batch[0].enqueued) * 1000:.1f}ms.")
+            except Exception as e:
+                logger.error(f"Object detection batcher error: {e}", exc_info=True)
+                for item in batch:
+                    if not item.future.done(): item.future.set_result({'status': 'error', 'message': "Error in object detection"})
+
+object_batcher = ObjectDetectionBatcher()
+
+
+# --- Multi-Process Inference Workers ---
+# Task kinds served by worker pools: 'object' covers object_detection and focus_detection.
+INFERENCE_TASK_KINDS = ('object', 'scene', 'text')
+
+def _parse_worker_counts(spec):
+    """ Parses 'object:2,scene:1,text:4' into {'object': 2, 'scene': 1, 'text': 4}. """
+    counts = {}
+    for part in spec.split(','):
+        if ':' not in part: continue
+        kind, count = (p.strip() for p in part.split(':', 1))
+        if kind not in INFERENCE_TASK_KINDS: logger.warning(f"Ignoring unknown INFERENCE_WORKERS kind '{kind}'."); continue
+        try: counts[kind] = int(count)
+        except ValueError: logger.warning(f"Ignoring invalid INFERENCE_WORKERS entry '{part}'.")
+    return {kind: count for kind, count in counts.items() if count > 0}
+
+def _attach_shared_memory(name):
+    """ Attaches to the front end's frame ring without letting this process's resource tracker unlink it. """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False) # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        try: resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception: pass
+        return shm
+
+def _worker_frame(shm, slot_bytes, task):
+    """ Zero-copy view of a task's frame in shared memory (or the inline frame if it didn't fit a slot). """
+    _, slot, shape, dtype, inline_frame, _ = task
+    if inline_frame is not None: return inline_frame
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=slot * slot_bytes)
+
+def _run_worker_tasks(kind, frames, tasks):
+    """ Runs a group of tasks inside a worker and returns (task_id, status, value) replies. """
+    if kind == 'object':
+        # Frames drained together run as one predict() per vocabulary and input size, like ObjectDetectionBatcher.
+        groups = OrderedDict()
+        for frame, task in zip(frames, tasks):
+            groups.setdefault((focus_vocabulary(task[5].get('focus_object')), task[5].get('imgsz')), []).append((frame, task))
+        replies = []
+        for (classes, imgsz), group in groups.items():
+            results = detect_objects_batch([f for f, _ in group], [t[5].get('focus_object') for _, t in group], classes=classes, imgsz=imgsz)
+            replies.extend((task[0], 'ok', result) for (_, task), result in zip(group, results))
+        return replies
+    replies = []
+    for frame, task in zip(frames, tasks):
+        try:
+            if kind == 'scene': value = detect_scene(frame)
+            else: value = detect_text(frame, language_code=task[5].get('language', DEFAULT_OCR_LANG), with_regions=True)
+            replies.append((task[0], 'ok', value))
+        except ModelNotReady as e:
+            replies.append((task[0], 'not_ready', (e.name, e.state, e.error)))
+        except Exception as e:
+            logger.error(f"Inference worker ({kind}) task error: {e}", exc_info=True)
+            replies.append((task[0], 'error', str(e)))
+    return replies
+
+def _drain_worker_metrics():
+    """
+    Metrics recorded in this worker since the last call (stage timings, batch sizes, errors,
+    OCR latencies) plus its current model states and embedding-cache and OCR-pool stats, for
+    the front end.
+    """
+    with ocr_latencies_lock:
+        latencies = {lang: list(samples) for lang, samples in ocr_latencies.items() if samples}
+        ocr_latencies.clear()
+    return {'stage_seconds': stage_seconds.drain(), 'yolo_batch_frames': yolo_batch_frames.drain(), 'errors_total': errors_total.drain(),
+            'ocr_latencies': latencies, 'models': model_registry.states(), 'class_embedding_cache': class_embedding_cache.stats(), 'ocr_pool': ocr_pool.stats() if ocr_pool else {}}
+
+def merge_worker_metrics(metrics):
+    """ Folds a worker's drained metrics into this process's /metrics and /ocr_stats. """
+    stage_seconds.merge(metrics['stage_seconds'])
+    yolo_batch_frames.merge(metrics['yolo_batch_frames'])
+    errors_total.merge(metrics['errors_total'])
+    for lang, samples in metrics['ocr_latencies'].items():
+        for seconds in samples: record_ocr_latency(lang, seconds)
+
+def _inference_worker_main(kind, conn, shm_name, slot_bytes):
+    """
+    Entry point of an inference worker process. Owns its own model copies (loaded through
+    its own model_registry), reads frames from the shared-memory ring and replies on conn.
+    When idle it sends (None, 'status', None, metrics) every WORKER_STATUS_INTERVAL_S, so the
+    front end sees its models become ready before any task reaches it.
+    """
+    shm = _attach_shared_memory(shm_name)
+    if kind in WORKER_KIND_MODELS: model_registry.warm_up([WORKER_KIND_MODELS[kind]])
+    elif ocr_pool: ocr_pool.warm_up([DEFAULT_OCR_LANG])
+    logger.info(f"Inference worker ({kind}) started, pid {os.getpid()}.")
+    stopping = False
+    while not stopping:
+        try:
+            if not conn.poll(WORKER_STATUS_INTERVAL_S): conn.send((None, 'status', None, _drain_worker_metrics())); continue
+            task = conn.recv()
+        except (EOFError, OSError): break
+        if task is None: break
+        tasks = [task]
+        # Drain whatever else is already queued so object frames can share a batch.
+        while kind == 'object' and len(tasks) < YOLO_BATCH_MAX_SIZE and conn.poll():
+            task = conn.recv()
+            if task is None: stopping = True; break
+            tasks.append(task)
+        frames = [_worker_frame(shm, slot_bytes, t) for t in tasks]
+        try:
+            replies = _run_worker_tasks(kind, frames, tasks)
+        except Exception as e:
+            logger.error(f"Inference worker ({kind}) batch error: {e}", exc_info=True)
+            replies = [(t[0], 'error', str(e)) for t in tasks]
+        del frames # Drop views into shared memory before the front end reuses the slots
+        # The batch's metrics ride along with its last reply: (task_id, status, value, metrics or None).
+        metrics = _drain_worker_metrics()
+        for i, reply in enumerate(replies): conn.send(reply + (metrics if i == len(replies) - 1 else None,))
+    shm.close()
+
+class InferenceWorkerPool:
+    """
+    Pool of inference worker processes for one task kind.
+
+    Decoded frames are copied once into a slot of a shared-memory ring buffer and only a
+    small task descriptor (slot, shape, dtype, params) goes over the worker's pipe, so
+    frames are never pickled. Tasks go to the worker with the fewest in-flight tasks.
+    A monitor thread restarts workers that crash or exceed WORKER_TASK_TIMEOUT_S on a
+    task, failing the tasks they held so handler threads never wait forever.
+    """
+    def __init__(self, kind, num_workers, slots_per_worker=SHM_SLOTS_PER_WORKER, slot_bytes=SHM_SLOT_BYTES):
+        self.kind = kind
+        self.slot_bytes = int(slot_bytes)
+        self._ctx = multiprocessing.get_context(WORKER_START_METHOD)
+        num_slots = max(1, num_workers * int(slots_per_worker))
+        self._shm = shared_memory.SharedMemory(create=True, size=num_slots * self.slot_bytes)
+        self._free_slots = queue.Queue()
+        for slot in range(num_slots): self._free_slots.put(slot)
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._inflight = {} # task_id -> (worker_index, slot, future, submitted_at)
+        self._workers = [None] * num_workers # (process, conn, send_lock)
+        self.restarts = 0
+        self.worker_stats = {} # worker index -> latest model states / embedding-cache / OCR-pool stats reported by it
+        self._closed = False
+        for index in range(num_workers): self._start_worker(index)
+        threading.Thread(target=self._read_results, name=f'{kind}-worker-results', daemon=True).start()
+        threading.Thread(target=self._monitor, name=f'{kind}-worker-monitor', daemon=True).start()
+        logger.info(f"Started {num_workers} '{kind}' inference worker(s) with {num_slots} shared-memory slot(s) of {self.slot_bytes / 1e6:.1f}MB.")
+
+    def _start_worker(self, index):
+        parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+        process = self._ctx.Process(target=_inference_worker_main, args=(self.kind, child_conn, self._shm.name, self.slot_bytes),
+                                    name=f'{self.kind}-worker-{index}', daemon=True)
+        process.start()
+        child_conn.close()
+        self._workers[index] = (process, parent_conn, threading.Lock())
+
+    def submit(self, frame, **params):
+        """ Hands a BGR frame to a worker. Returns a Future resolving to (status, value). """
+        future = Future()
+        frame = np.ascontiguousarray(frame)
+        slot = None
+        if frame.nbytes <= self.slot_bytes:
+            try: slot = self._free_slots.get(timeout=WORKER_TASK_TIMEOUT_S)
+            except queue.Empty: future.set_result(('error', "No free shared-memory slot")); return future
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._shm.buf, offset=slot * self.slot_bytes)[...] = frame
+            task_frame = None
+        else:
+            logger.debug(f"Frame of {frame.nbytes} bytes exceeds SHM_SLOT_BYTES; sending it inline.")
+            task_frame = frame
+        task_id = next(self._task_ids)
+        with self._lock:
+            loads = [0] * len(self._workers)
+            for worker_index, *_ in self._inflight.values(): loads[worker_index] += 1
+            worker_index = loads.index(min(loads))
+            self._inflight[task_id] = (worker_index, slot, future, time.monotonic())
+            _, conn, send_lock = self._workers[worker_index]
+        try:
+            with send_lock: conn.send((task_id, slot, frame.shape, frame.dtype.str, task_frame, params))
+        except (OSError, ValueError) as e:
+            self._finish(task_id, ('error', f"Worker unavailable: {e}"))
+        return future
+
+    def _finish(self, task_id, outcome):
+        with self._lock: entry = self._inflight.pop(task_id, None)
+        if entry is None: return
+        _, slot, future, _ = entry
+        if slot is not None: self._free_slots.put(slot)
+        if not future.done(): future.set_result(outcome)
+
+    def _read_results(self):
+        while not self._closed:
+            with self._lock: conns = {worker[1]: index for index, worker in enumerate(self._workers) if worker}
+            try: ready = multiprocessing.connection.wait(list(conns), timeout=0.5)
+            except OSError: continue
+            for conn in ready:
+                try: task_id, status, value, metrics = conn.recv()
+                except (EOFError, OSError): time.sleep(0.05); continue # Worker died; the monitor restarts it
+                if metrics is not None:
+                    merge_worker_metrics(metrics)
+                    self.worker_stats[conns[conn]] = {'models': metrics['models'], 'class_embedding_cache': metrics['class_embedding_cache'], 'ocr_pool': metrics['ocr_pool']}
+                if task_id is not None: self._finish(task_id, (status, value)) # None: an idle worker's status report
+
+    def _fail_worker_tasks(self, index, message):
+        with self._lock: task_ids = [task_id for task_id, entry in self._inflight.items() if entry[0] == index]
+        for task_id in task_ids: self._finish(task_id, ('error', message))
+
+    def _monitor(self):
+        while not self._closed:
+            time.sleep(1.0)
+            now = time.monotonic()
+            with self._lock: stuck = {entry[0] for entry in self._inflight.values() if now - entry[3] > WORKER_TASK_TIMEOUT_S}
+            for index, worker in enumerate(self._workers):
+                process, conn, _ = worker
+                if process.is_alive() and index not in stuck: continue
+                if process.is_alive():
+                    logger.error(f"'{self.kind}' worker {index} (pid {process.pid}) exceeded {WORKER_TASK_TIMEOUT_S}s on a task; restarting it.")
+                    process.terminate()
+                else:
+                    logger.error(f"'{self.kind}' worker {index} (pid {process.pid}) exited with code {process.exitcode}; restarting it.")
+                process.join(timeout=5)
+                conn.close()
+                self._fail_worker_tasks(index, "Inference worker restarted")
+                self.worker_stats.pop(index, None)
+                with self._lock: self._start_worker(index)
+                self.restarts += 1
+
+    def close(self):
+        self._closed = True
+        for process, conn, send_lock in self._workers:
+            try:
+                with send_lock: conn.send(None)
+            except (OSError, ValueError): pass
+        for process, conn, _ in self._workers:
+            process.join(timeout=5)
+            if process.is_alive(): process.terminate()
+            conn.close()
+        self._shm.close()
+        self._shm.unlink()
+
+    def stats(self):
+        with self._lock: inflight = len(self._inflight)
+        return {'workers': len(self._workers), 'alive': sum(1 for w in self._workers if w[0].is_alive()), 'inflight': inflight, 'restarts': self.restarts}
+
+    def model_state(self, name):
+        """
+        Load state of a model across the workers, in ModelRegistry.states() form. Tasks go to
+        any worker, so this is the least-ready worker's state ('pending' until every worker,
+        including a restarted one, has reported); load_time_s is the slowest worker's.
+        """
+        reported = [stats['models'][name] for stats in list(self.worker_stats.values()) if name in stats['models']]
+        if len(reported) < len(self._workers): reported.append({'state': 'pending', 'load_time_s': None, 'error': None})
+        worst = min(reported, key=lambda status: MODEL_STATE_ORDER.index(status['state']))
+        load_times = [status['load_time_s'] for status in reported if status['load_time_s'] is not None]
+        return dict(worst, load_time_s=max(load_times) if worst['state'] == 'ready' and load_times else worst['load_time_s'])
+
+inference_pools = {} # kind -> InferenceWorkerPool, empty when inference runs in-process
+WORKER_KIND_MODELS = {'object': 'yolo', 'scene': 'places365'} # Registry model each worker kind loads
+MODEL_STATE_ORDER = ('failed', 'pending', 'loading', 'ready') # Least to most ready
+
+def model_states():
+    """
+    Load state of every model where it actually serves requests: the inference workers'
+    state for models INFERENCE_WORKERS serves, this process's model_registry for the rest.
+    """
+    states = model_registry.states()
+    for kind, name in WORKER_KIND_MODELS.items():
+        if kind in inference_pools: states[name] = inference_pools[kind].model_state(name)
+    return states
+
+def start_inference_workers():
+    """ Starts the worker pools configured by INFERENCE_WORKERS (idempotent; front-end process only). """
+    if inference_pools or IN_WORKER_PROCESS: return
+    for kind, count in _parse_worker_counts(INFERENCE_WORKERS).items():
+        inference_pools[kind] = InferenceWorkerPool(kind, count)
+    if inference_pools: atexit.register(stop_inference_workers)
+
+def warm_up_server():
+    """
+    Starts loading models (MODEL_WARMUP) and a default-language OCR engine in the server
+    process, skipping whatever INFERENCE_WORKERS serves: those workers load their own copies.
+    """
+    worker_kinds = _parse_worker_counts(INFERENCE_WORKERS)
+    names = [name for kind, name in WORKER_KIND_MODELS.items() if kind not in worker_kinds]
+    if MODEL_WARMUP and names: model_registry.warm_up(names)
+    if ocr_pool and 'text' not in worker_kinds: ocr_pool.warm_up([DEFAULT_OCR_LANG])
+
+def stop_inference_workers():
+    for kind in list(inference_pools):
+        try: inference_pools.pop(kind).close()
+        except Exception as e: logger.error(f"Error stopping '{kind}' inference workers: {e}")
+
+if not IN_WORKER_PROCESS: warm_up_server()
+
+def _worker_outcome(future):
+    """ Unpacks a worker reply, re-raising ModelNotReady in this process. """
+    status, value = future.result(timeout=WORKER_TASK_TIMEOUT_S + 10)
+    if status == 'ok': return value
+    if status == 'not_ready': raise ModelNotReady(*value)
+    raise RuntimeError(value)
+
+def submit_objects(image_np, focus_object=None, imgsz=None):
+    """ Non-blocking infer_objects(): queues the frame and returns a callable that waits for its result dict. """
+    pool = inference_pools.get('object')
+    if pool is None: return object_batcher.submit(image_np, focus_object=focus_object, imgsz=imgsz).result
+    future = pool.submit(image_np, focus_object=focus_object, imgsz=imgsz)
+    def result():
+        try: return _worker_outcome(future)
+        except ModelNotReady as e: return model_unavailable_result(e)
+        except Exception as e: logger.error(f"Object detection worker error: {e}"); return {'status': 'error', 'message': "Error in object detection"}
+    return result
+
+def infer_objects(image_np, focus_object=None, imgsz=None):
+    """ Object/focus detection via the 'object' worker pool if configured, else the in-process batcher. """
+    return submit_objects(image_np, focus_object=focus_object, imgsz=imgsz)()
+
+def infer_scene(image_np, rgb=None):
+    """ detect_scene() via the 'scene' worker pool if configured (workers convert the frame themselves). """
+    pool = inference_pools.get('scene')
+    if pool is None: return detect_scene(image_np, rgb=rgb)
+    try: return _worker_outcome(pool.submit(image_np))
+    except ModelNotReady: raise
+    except Exception as e: logger.error(f"Scene detection worker error: {e}"); return "Error in scene detection"
+
+def infer_text(image_np, language_code=DEFAULT_OCR_LANG, gray=None):
+    """ detect_text(..., with_regions=True) via the 'text' worker pool if configured (workers convert the frame themselves). """
+    pool = inference_pools.get('text')
+    if pool is None: return detect_text(image_np, language_code=language_code, with_regions=True, gray=gray)
+    try: return tuple(_worker_outcome(pool.submit(image_np, language=language_code)))
+    except Exception as e: logger.error(f"Text detection worker error: {e}"); return f"Error during text detection ({language_code})", []
+
+
+# --- Frame Decoding ---
+# Raw pixel layouts accepted as binary attachments (data['format']): bytes per pixel
+# and the OpenCV conversion to BGR (None = already BGR).
+RAW_FRAME_FORMATS = {
+    'bgr': (3, None),
+    'rgb': (3, cv2.COLOR_RGB2BGR),
+    'gray': (1, cv2.COLOR_GRAY2BGR),
+    'nv21': (1.5, cv2.COLOR_YUV2BGR_NV21),
+    'nv12': (1.5, cv2.COLOR_YUV2BGR_NV12),
+    'i420': (1.5, cv2.COLOR_YUV2BGR_I420),
+    'yuv420': (1.5, cv2.COLOR_YUV2BGR_I420),
+}
+
+def decode_image(data):
+    """
+    Decodes the frame carried by a 'message' payload into a BGR numpy array.
+
+    Supported payloads:
+      - data['image'] as a base64 string / data URL (legacy clients).
+      - data['image'] as a SocketIO binary attachment (bytes) holding an encoded JPEG/PNG.
+      - data['image'] as bytes holding raw pixels, with data['format'] in RAW_FRAME_FORMATS
+        and integer data['width'] / data['height'].
+
+    Binary payloads are wrapped with np.frombuffer (no copy) and handed straight to OpenCV.
+
+    Raises:
+        ValueError: If the payload cannot be decoded.
+    """
+    image_data = data.get('image')
+    if isinstance(image_data, str):
+        if ',' in image_data: _, encoded = image_data.split(',', 1)
+        else: encoded = image_data
+        buffer = np.frombuffer(base64.b64decode(encoded), np.uint8)
+    elif isinstance(image_data, (bytes, bytearray, memoryview)):
+        buffer = np.frombuffer(image_data, np.uint8)
+    else:
+        raise ValueError(f"Unsupported image payload type: {type(image_data).__name__}")
+
+    frame_format = (data.get('format') or '').lower()
+    if frame_format and frame_format not in ('jpeg', 'jpg', 'png'):
+        if frame_format not in RAW_FRAME_FORMATS: raise ValueError(f"Unsupported raw frame format '{frame_format}'")
+        if isinstance(image_data, str): raise ValueError("Raw frame formats must be sent as binary attachments")
+        try: width, height = int(data['width']), int(data['height'])
+        except (KeyError, TypeError, ValueError): raise ValueError("Raw frames require integer 'width' and 'height'")
+        bytes_per_pixel, conversion = RAW_FRAME_FORMATS[frame_format]
+        expected_size = int(width * height * bytes_per_pixel)
+        if width <= 0 or height <= 0 or buffer.size != expected_size:
+            raise ValueError(f"Raw '{frame_format}' frame size mismatch: got {buffer.size} bytes, expected {expected_size} for {width}x{height}")
+        if frame_format in ('bgr', 'rgb'): frame = buffer.reshape(height, width, 3)
+        elif frame_format == 'gray': frame = buffer.reshape(height, width)
+        else: frame = buffer.reshape(height * 3 // 2, width) # Planar/semi-planar YUV 4:2:0
+        return frame if conversion is None else cv2.cvtColor(frame, conversion)
+
+    image_np = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image_np is None: raise ValueError("cv2.imdecode failed")
+    return image_np
+
+
+def downscale_to(image_np, max_side):
+    """ Shrinks a frame (never enlarges it) so its longer side is at most max_side pixels. """
+    height, width = image_np.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1.0: return image_np
+    return cv2.resize(image_np, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+
+def to_gray(image_np):
+    """ Grayscale view of a decoded frame (BGR frames are converted, gray frames returned as is). """
+    return cv2.cvtColor(image_np, cv2.COLOR_BGR2GRAY) if image_np.ndim == 3 else image_np
+
+class FrameConversions:
+    """
+    Lazily computed, shared conversions of one decoded BGR frame: grayscale, dHash and the
+    per-task model inputs (YOLO frame at a given imgsz, Places365 square, OCR frame).
+    multi_detection runs several tasks on the same frame concurrently; each conversion is
+    computed once by whichever task needs it first and reused by the others.
+    """
+    def __init__(self, image_np):
+        self.image = image_np
+        self._values = {}
+        self._locks = {} # One lock per conversion, so unrelated conversions compute concurrently
+        self._locks_guard = threading.Lock()
+
+    def _get(self, name, compute):
+        if name in self._values: return self._values[name]
+        with self._locks_guard: lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._values: self._values[name] = compute()
+            return self._values[name]
+
+    @property
+    def gray(self): return self._get('gray', lambda: to_gray(self.image))
+    @property
+    def dhash(self): return self._get('dhash', lambda: frame_dhash(self.image, gray=self.gray))
+    @property
+    def text_dhash(self): return self._get('text_dhash', lambda: frame_dhash(self.ocr_input, hash_size=TEXT_CACHE_HASH_SIZE, gray=self.ocr_gray))
+
+    def yolo_input(self, imgsz):
+        """ Frame with its longer side at most imgsz (YOLO letterboxes to imgsz anyway). """
+        return self._get(('yolo', imgsz), lambda: downscale_to(self.image, imgsz))
+    @property
+    def scene_input(self):
+        interpolation = cv2.INTER_AREA if min(self.image.shape[:2]) >= SCENE_INPUT_SIZE else cv2.INTER_LINEAR
+        return self._get('scene', lambda: cv2.resize(self.image, (SCENE_INPUT_SIZE, SCENE_INPUT_SIZE), interpolation=interpolation))
+    @property
+    def scene_rgb(self): return self._get('scene_rgb', lambda: cv2.cvtColor(self.scene_input, cv2.COLOR_BGR2RGB if self.scene_input.ndim == 3 else cv2.COLOR_GRAY2RGB))
+    @property
+    def ocr_input(self): return self._get('ocr', lambda: downscale_to(self.image, OCR_MAX_INPUT_SIDE) if OCR_MAX_INPUT_SIDE > 0 else self.image)
+    @property
+    def ocr_gray(self): return self._get('ocr_gray', lambda: self.gray if self.ocr_input is self.image else to_gray(self.ocr_input))
+
+
+# --- Temporal Result Cache ---
+def frame_dhash(image_np, hash_size=8, gray=None):
+    """
+    Computes a 64-bit difference hash (dHash) of a BGR frame: the frame is shrunk to a
+    (hash_size + 1) x hash_size grayscale thumbnail and each bit records whether a pixel
+    is brighter than its right-hand neighbour. Similar frames give hashes with a small
+    Hamming distance.
+    """
+    if gray is None: gray = to_gray(image_np)
+    thumb = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = thumb[:, 1:] > thumb[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming_distance(hash_a, hash_b):
+    return bin(hash_a ^ hash_b).count('1')
+
+class FrameResultCache:
+    """
+    Per-session cache of detection results keyed by perceptual frame hash.
+
+    A lookup hits when a cached entry with the same key (e.g. OCR language) has a hash
+    within max_distance bits of the new frame and is younger than ttl seconds. Entries
+    expire by TTL and the least recently used entry is evicted beyond max_entries.
+    """
+    def __init__(self, ttl, max_distance, max_entries=FRAME_CACHE_MAX_ENTRIES):
+        self.ttl = float(ttl)
+        self.max_distance = int(max_distance)
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict() # (frame_hash, key) -> (created_at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _evict_expired(self, now):
+        for entry_key in [k for k, (created_at, _) in self._entries.items() if now - created_at > self.ttl]:
+            del self._entries[entry_key]
+
+    def get(self, frame_hash, key=None):
+        """ Returns a copy of the closest cached result for a similar frame, or None. """
+        if self.ttl <= 0: return None
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            best_key, best_distance = None, self.max_distance + 1
+            for entry_key in self._entries:
+                if entry_key[1] != key: continue
+                distance = hamming_distance(entry_key[0], frame_hash)
+                if distance < best_distance: best_key, best_distance = entry_key, distance
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return dict(self._entries[best_key][1])
+
+    def put(self, frame_hash, result, key=None):
+        if self.ttl <= 0: return
+        with self._lock:
+            self._entries[(frame_hash, key)] = (time.monotonic(), dict(result))
+            self._entries.move_to_end((frame_hash, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'hit_rate': (self.hits / lookups) if lookups else 0.0}
+
+
+# --- Focus Mode Tracking ---
+class FocusTracker:
+    """
+    Lightweight correlation tracker for one session's focus object.
+
+    Seeded from the last 'found' detection, it follows the object on later frames by
+    normalized cross-correlation (cv2.matchTemplate) of the seed patch inside a search
+    window around the last position, on a downscaled grayscale frame. Full detection
+    is requested again every redetect_interval frames, when the match score drops
+    below min_score, or when the focus object changes. Used by one session at a time
+    (frames are serialized by its SessionFrameQueue).
+    """
+    def __init__(self, redetect_interval=FOCUS_REDETECT_INTERVAL, min_score=FOCUS_TRACKER_MIN_SCORE, search_scale=FOCUS_TRACKER_SEARCH_SCALE):
+        self.redetect_interval = max(1, int(redetect_interval))
+        self.min_score = float(min_score)
+        self.search_scale = max(1.0, float(search_scale))
+        self.tracked_frames = 0
+        self.detected_frames = 0
+        self.reset()
+
+    def reset(self):
+        self.focus_object = None
+        self.detection = None # Last full detection dict (schema of detect_objects focus mode)
+        self.template = None
+        self.center = None # (x, y) in working-frame pixels
+        self.frames_since_detection = 0
+
+    @staticmethod
+    def _working_frame(image_np):
+        """ Grayscale frame downscaled to TRACKER_WORK_WIDTH, plus the scale factor used. """
+        gray = to_gray(image_np)
+        scale = min(1.0, TRACKER_WORK_WIDTH / gray.shape[1])
+        if scale < 1.0: gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def observe(self, image_np, focus_object, result):
+        """ Seeds (or clears) the tracker from a full detect_objects() focus-mode result. """
+        self.detected_frames += 1
+        if not isinstance(result, dict) or result.get('status') != 'found':
+            self.reset()
+            return
+        gray = self._working_frame(image_np)
+        frame_h, frame_w = gray.shape[:2]
+        det = result['detection']
+        box_w, box_h = int(det['width'] * frame_w), int(det['height'] * frame_h)
+        cx, cy = det['center_x'] * frame_w, det['center_y'] * frame_h
+        x1, y1 = max(0, int(cx - box_w / 2)), max(0, int(cy - box_h / 2))
+        x2, y2 = min(frame_w, x1 + box_w), min(frame_h, y1 + box_h)
+        # Too small to correlate reliably, or covering (almost) the whole frame: keep detecting.
+        if x2 - x1 < 8 or y2 - y1 < 8 or (x2 - x1) * (y2 - y1) > 0.8 * frame_w * frame_h:
+            self.reset()
+            return
+        self.focus_object = focus_object.lower()
+        self.detection = dict(det)
+        self.template = gray[y1:y2, x1:x2].copy()
+        self.center = (cx, cy)
+        self.frames_since_detection = 0
+
+    def update(self, image_np, focus_object):
+        """ Returns a tracked focus-mode result for this frame, or None if full detection is needed. """
+        if self.template is None or focus_object.lower() != self.focus_object or self.frames_since_detection + 1 >= self.redetect_interval:
+            return None
+        gray = self._working_frame(image_np)
+        frame_h, frame_w = gray.shape[:2]
+        tmpl_h, tmpl_w = self.template.shape[:2]
+        # Search window around the last known position
+        half_w, half_h = tmpl_w * self.search_scale / 2, tmpl_h * self.search_scale / 2
+        sx1, sy1 = max(0, int(self.center[0] - half_w)), max(0, int(self.center[1] - half_h))
+        sx2, sy2 = min(frame_w, int(self.center[0] + half_w)), min(frame_h, int(self.center[1] + half_h))
+        if sx2 - sx1 < tmpl_w or sy2 - sy1 < tmpl_h:
+            self.reset()
+            return None
+        scores = cv2.matchTemplate(gray[sy1:sy2, sx1:sx2], self.template, cv2.TM_CCOEFF_NORMED)
+        _, best_score, _, best_loc = cv2.minMaxLoc(scores)
+        if best_score < self.min_score:
+            logger.debug(f"Focus tracker lost '{self.focus_object}' (score {best_score:.2f}), re-detecting.")
+            self.reset()
+            return None
+        self.center = (sx1 + best_loc[0] + tmpl_w / 2, sy1 + best_loc[1] + tmpl_h / 2)
+        self.frames_since_detection += 1
+        self.tracked_frames += 1
+        detection = dict(self.detection, center_x=self.center[0] / frame_w, center_y=self.center[1] / frame_h)
+        return {'status': 'found', 'detection': detection, 'tracked': True}
+
+    def stats(self):
+        return {'tracked_frames': self.tracked_frames, 'detected_frames': self.detected_frames, 'active': self.template is not None}
+
+
+# --- Per-Session Frame Queues ---
+class SessionFrameQueue:
+    """
+    Bounded latest-frame-wins queue for one client session.
+
+    At most one frame per session is processed at a time and at most max_pending frames
+    wait behind it. When a new frame arrives and the queue is full, the oldest waiting
+    frame (one that has not started processing) is dropped, so results never lag far
+    behind the camera. Handler threads block in acquire() until it is their turn.
+    """
+    def __init__(self, max_pending=SESSION_QUEUE_MAX_PENDING):
+        self.max_pending = max(1, int(max_pending))
+        self._cond = threading.Condition()
+        self._waiting = deque() # Tickets (one-element lists: [dropped]) in arrival order
+        self._busy = False
+        self._closed = False
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+
+    def acquire(self):
+        """ Waits for this frame's turn. Returns True to process it, False if it was superseded. """
+        ticket = [False]
+        with self._cond:
+            self.received += 1
+            if self._closed: self.dropped += 1; return False
+            if not self._busy and not self._waiting:
+                self._busy = True
+                return True
+            self._waiting.append(ticket)
+            while len(self._waiting) > self.max_pending:
+                self._waiting.popleft()[0] = True
+                self.dropped += 1
+            self._cond.notify_all()
+            while not ticket[0]:
+                if not self._busy and self._waiting[0] is ticket:
+                    self._waiting.popleft()
+                    self._busy = True
+                    return True
+                self._cond.wait()
+            return False
+
+    def release(self):
+        """ Marks the in-flight frame as finished and wakes the next waiting frame. """
+        with self._cond:
+            self._busy = False
+            self.processed += 1
+            self._cond.notify_all()
+
+    def close(self):
+        """ Drops every waiting frame (used when the client disconnects). """
+        with self._cond:
+            self._closed = True
+            while self._waiting:
+                self._waiting.popleft()[0] = True
+                self.dropped += 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queue_depth': len(self._waiting) + (1 if self._busy else 0),
+                'received': self.received,
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'drop_rate': (self.dropped / self.received) if self.received else 0.0,
+            }
+
+def snap_imgsz(value):
+    """ Maps a client-requested YOLO input size to the largest allowed level not above it (None if invalid). """
+    try: value = int(value)
+    except (TypeError, ValueError): return None
+    if YOLO_BACKEND != 'torch': return YOLO_EXPORT_IMGSZ
+    return max([level for level in YOLO_IMGSZ_LEVELS if level <= value] or [YOLO_IMGSZ_LEVELS[0]])
+
+class LatencyBudgetController:
+    """
+    Keeps a session's request latency within its budget by adjusting the YOLO input size
+    and the capture frame rate suggested to the client.
+
+    An EWMA of recent request latencies is compared with the budget. Above it, the YOLO
+    input size steps down one level (for requests that ran YOLO) and, once at the smallest
+    level or for other tasks, the suggested frame rate halves. Below half the budget the
+    frame rate recovers first, then the input size, up to YOLO_IMGSZ. Adjustments are at
+    least LATENCY_CONTROLLER_COOLDOWN requests apart so each change is measured first.
+    """
+    def __init__(self, budget_ms=LATENCY_BUDGET_MS):
+        self.levels = YOLO_IMGSZ_LEVELS if YOLO_BACKEND == 'torch' else (YOLO_EXPORT_IMGSZ,)
+        self.max_level = self.levels.index(YOLO_IMGSZ) if YOLO_IMGSZ in self.levels else len(self.levels) - 1
+        self.level = self.max_level
+        self.fps = CAPTURE_MAX_FPS
+        self.budget = max(0.0, float(budget_ms)) / 1000.0
+        self.ewma = None
+        self.adjustments = 0
+        self._since_change = 0
+        self._lock = threading.Lock()
+
+    @property
+    def imgsz(self): return self.levels[self.level]
+
+    def set_budget(self, budget_ms):
+        with self._lock: self.budget = max(0.0, float(budget_ms)) / 1000.0
+
+    def record(self, latency_s, used_yolo=True):
+        """ Adds one request latency. Returns True if imgsz or fps changed. """
+        with self._lock:
+            if self.budget <= 0: return False
+            self.ewma = latency_s if self.ewma is None else LATENCY_EWMA_ALPHA * latency_s + (1 - LATENCY_EWMA_ALPHA) * self.ewma
+            self._since_change += 1
+            if self._since_change < LATENCY_CONTROLLER_COOLDOWN: return False
+            before = (self.level, self.fps)
+            if self.ewma > self.budget:
+                if used_yolo and self.level > 0: self.level -= 1
+                else: self.fps = max(CAPTURE_MIN_FPS, self.fps / 2)
+            elif self.ewma < self.budget / 2:
+                if self.fps < CAPTURE_MAX_FPS: self.fps = min(CAPTURE_MAX_FPS, self.fps * 2)
+                elif used_yolo and self.level < self.max_level: self.level += 1
+            if (self.level, self.fps) == before: return False
+            self._since_change = 0; self.adjustments += 1
+            logger.debug(f"Latency controller: EWMA {self.ewma * 1000:.0f}ms vs budget {self.budget * 1000:.0f}ms -> imgsz {self.imgsz}, fps {self.fps:g}.")
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {'budget_ms': round(self.budget * 1000), 'ewma_ms': round(self.ewma * 1000, 1) if self.ewma is not None else None,
+                    'imgsz': self.imgsz, 'fps': self.fps, 'adjustments': self.adjustments}
+
+def capture_settings(detection_types, frame_shape, imgsz, fps):
+    """
+    Capture settings returned to the client: the largest upload size any requested task
+    uses ('max_side', longer side in pixels; None = full resolution), the YOLO input size
+    and the suggested frame rate.
+    """
+    height, width = frame_shape[:2]
+    sides = []
+    for detection_type in detection_types:
+        if detection_type in ('object_detection', 'focus_detection'): sides.append(imgsz)
+        elif detection_type == 'scene_detection': sides.append(math.ceil(SCENE_INPUT_SIZE * max(height, width) / max(1, min(height, width))))
+        elif detection_type == 'text_detection': sides.append(OCR_MAX_INPUT_SIDE or None)
+    max_side = None if not sides or None in sides else max(sides)
+    return {'max_side': max_side, 'imgsz': imgsz, 'fps': fps}
+
+class ClientSession:
+    """ Per-connection server-side state, keyed by request.sid in client_sessions. """
+    def __init__(self, sid):
+        self.sid = sid
+        self.connected_at = time.time()
+        self.frame_queue = SessionFrameQueue()
+        self.scene_cache = FrameResultCache(SCENE_CACHE_TTL_S, SCENE_CACHE_MAX_DISTANCE)
+        self.text_cache = FrameResultCache(TEXT_CACHE_TTL_S, TEXT_CACHE_MAX_DISTANCE)
+        self.focus_tracker = FocusTracker()
+        self.latency = LatencyBudgetController()
+        self.last_capture = None # Last capture settings sent to the client
+        self.last_new_vocabulary_at = float('-inf') # See FOCUS_NEW_VOCABULARY_INTERVAL_S
+        self._task_executor = None
+        self._task_executor_lock = threading.Lock()
+
+    @property
+    def task_executor(self):
+        """
+        This session's multi_detection threads (one per task kind, created on first use), so
+        slow tasks of one client never hold up another client's tasks.
+        """
+        with self._task_executor_lock:
+            if self._task_executor is None:
+                self._task_executor = ThreadPoolExecutor(max_workers=len(MULTI_DETECTION_TASKS), thread_name_prefix=f'multi-task-{self.sid}')
+            return self._task_executor
+
+    def close(self):
+        self.frame_queue.close()
+        with self._task_executor_lock:
+            if self._task_executor is not None: self._task_executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            'connected_for': round(time.time() - self.connected_at, 1),
+            **self.frame_queue.stats(),
+            'scene_cache': self.scene_cache.stats(),
+            'text_cache': self.text_cache.stats(),
+            'focus_tracker': self.focus_tracker.stats(),
+            'latency': self.latency.stats(),
+        }
+
+client_sessions = {}
+client_sessions_lock = threading.Lock()
+
+def get_client_session(sid):
+    """ Returns the ClientSession for sid, creating it on first use. """
+    with client_sessions_lock:
+        session = client_sessions.get(sid)
+        if session is None:
+            session = client_sessions[sid] = ClientSession(sid)
+        return session
+
+def close_client_session(sid):
+    """ Removes the session for sid and releases any frames still waiting in its queue. """
+    with client_sessions_lock:
+        session = client_sessions.pop(sid, None)
+    if session is not None:
+        session.close()
+        logger.info(f"Session {sid} closed: {session.stats()}")
+
+
+# --- Detection Dispatch ---
+def run_detection(detection_type, image_np, language_code=DEFAULT_OCR_LANG, focus_object=None, session=None, conversions=None, imgsz=None):
+    """
+    Runs one detection type on a decoded BGR frame and returns the structured result dict
+    sent to clients as {'result': ...}. When a ClientSession is given, scene and text
+    results are served from its temporal cache for near-identical frames, and focus
+    results from its tracker between full detections (flagged 'tracked': True).
+    conversions (FrameConversions) shares conversions and per-model downscaled inputs between
+    tasks on the same frame; imgsz is the YOLO input size (default YOLO_IMGSZ).
+    """
+    if conversions is None: conversions = FrameConversions(image_np)
+    imgsz = imgsz or YOLO_IMGSZ
+    try:
+        # Inference runs on the worker pools when INFERENCE_WORKERS is set, otherwise in-process
+        # (object/focus via the cross-client batcher). Either way the calling handler thread
+        # blocks on its own Future and emits the result to its client.
+        if detection_type == 'object_detection':
+            return infer_objects(conversions.yolo_input(imgsz), imgsz=imgsz) # Normal mode
+        elif detection_type == 'focus_detection':
+            # Between periodic re-detections the session's tracker follows the last found box.
+            if session and FOCUS_TRACKING_ENABLED:
+                tracked = session.focus_tracker.update(image_np, focus_object)
+                if tracked is not None: return tracked
+            if session and 'object' not in inference_pools and not vocabulary_cached(focus_vocabulary(focus_object)):
+                # Encode a new focus vocabulary here, in this session's thread, not in the shared batcher.
+                if time.monotonic() - session.last_new_vocabulary_at < FOCUS_NEW_VOCABULARY_INTERVAL_S:
+                    # Not a failure: like a model still loading, the next frame will get through.
+                    return {'status': 'loading', 'message': f"Preparing focus object '{focus_object}', try again shortly"}
+                session.last_new_vocabulary_at = time.monotonic()
+                prepare_focus_vocabulary(focus_object)
+            result = infer_objects(conversions.yolo_input(imgsz), focus_object=focus_object, imgsz=imgsz) # Focus mode (boxes are normalized)
+            if session and FOCUS_TRACKING_ENABLED: session.focus_tracker.observe(image_np, focus_object, result)
+            return result
+        elif detection_type == 'scene_detection':
+            frame_hash = conversions.dhash if session else None
+            if session:
+                cached = session.scene_cache.get(frame_hash)
+                if cached is not None: return cached
+            # Scene detection doesn't usually return structured status, wrap it for consistency
+            scene_label = infer_scene(conversions.scene_input, rgb=conversions.scene_rgb if 'scene' not in inference_pools else None)
+            if "Error" in scene_label: return {'status': 'error', 'message': scene_label}
+            elif "Unknown" in scene_label: result = {'status': 'none'} # Or 'ok' with label? Depends on FE.
+            else: result = {'status': 'ok', 'scene': scene_label}
+            if session: session.scene_cache.put(frame_hash, result)
+            return result
+        elif detection_type == 'text_detection':
+            frame_hash = conversions.text_dhash if session else None
+            if session:
+                cached = session.text_cache.get(frame_hash, key=language_code)
+                if cached is not None: return cached
+            # Wrap text detection result
+            text_result, text_regions = infer_text(conversions.ocr_input, language_code=language_code, gray=conversions.ocr_gray if 'text' not in inference_pools else None)
+            if "Error" in text_result: return {'status': 'error', 'message': text_result}
+            elif "No text detected" in text_result: result = {'status': 'none'}
+            else: result = {'status': 'ok', 'text': text_result}
+            if TEXT_RETURN_REGIONS and text_regions: result['regions'] = text_regions
+            if session: session.text_cache.put(frame_hash, result, key=language_code)
+            return result
+        else:
+            return {'status': 'error', 'message': f"Unsupported detection type '{detection_type}'"}
+    except ModelNotReady as e:
+        return model_unavailable_result(e)
+
+def run_multi_detection(tasks, image_np, language_code=DEFAULT_OCR_LANG, focus_object=None, session=None, imgsz=None):
+    """
+    Runs several detection tasks (MULTI_DETECTION_TASKS keys) on one decoded frame concurrently
+    and returns ({'status': 'ok'|'partial', 'results': {task: result}}, unfinished_futures).
+    Tasks share one FrameConversions, so the frame is colour-converted and hashed at most
+    once. Torch and Tesseract release the GIL, so the tasks overlap. Tasks still running
+    after MULTI_TASK_TIMEOUT_S are reported as {'status': 'timeout'}; they keep using the
+    session's tracker and caches, so the caller must wait for unfinished_futures before
+    letting the session's next frame run.
+    """
+    conversions = FrameConversions(image_np)
+    executor = session.task_executor if session else ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix='multi-task')
+    futures = {task: executor.submit(run_detection, MULTI_DETECTION_TASKS[task], image_np, language_code=language_code,
+                                    focus_object=focus_object, session=session, conversions=conversions, imgsz=imgsz)
+               for task in tasks}
+    if session is None: executor.shutdown(wait=False) # Threads exit once their task is done
+    wait_futures(futures.values(), timeout=MULTI_TASK_TIMEOUT_S)
+    results = {}
+    for task, future in futures.items():
+        if not future.done():
+            logger.warning(f"multi_detection task '{task}' exceeded {MULTI_TASK_TIMEOUT_S}s.")
+            results[task] = {'status': 'timeout'}
+            continue
+        try: results[task] = future.result()
+        except Exception as e: logger.error(f"multi_detection task '{task}' error: {e}", exc_info=True); results[task] = {'status': 'error', 'message': f"Error in {MULTI_DETECTION_TASKS[task].replace('_', ' ')}"}
+    status = 'partial' if any(r.get('status') == 'timeout' for r in results.values()) else 'ok'
+    return {'status': status, 'results': results}, [future for future in futures.values() if not future.done()]
+
+
+# --- Bulk Video / Image Directory Processing ---
+# Offline mode for recorded walks and image batches (auditing, confidence tuning). Frames flow
+# through a generator pipeline (read -> sample -> batch -> detect -> JSON Lines), so memory stays
+# constant whatever the input length, and each batch is flushed as soon as it is processed.
+BULK_TASKS = ('object', 'scene', 'text')
+
+def iter_video_frames(path, fps=0.0, start_frame=0):
+    """
+    Yields (frame_index, time_s, source, frame) from a video file via cv2.VideoCapture.
+    With fps > 0 only frames at least 1/fps apart are decoded; skipped frames are only
+    grabbed. Starts at start_frame (used when resuming a job).
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened(): raise ValueError(f"Cannot open video '{path}'")
+    try:
+        video_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        step = max(1, round(video_fps / fps)) if fps > 0 else 1
+        index = start_frame
+        if start_frame: capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        while True:
+            if index % step:
+                if not capture.grab(): break
+                index += 1; continue
+            ok, frame = capture.read()
+            if not ok: break
+            yield index, round(index / video_fps, 3), os.path.basename(path), frame
+            index += 1
+    finally:
+        capture.release()
+
+def iter_image_frames(path, start_frame=0):
+    """ Yields (frame_index, None, filename, frame) for the images in a directory, in name order. """
+    names = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+    for index in range(start_frame, len(names)):
+        frame = cv2.imread(os.path.join(path, names[index]), cv2.IMREAD_COLOR)
+        if frame is None: logger.warning(f"Bulk: skipping unreadable image '{names[index]}'."); continue
+        yield index, None, names[index], frame
+
+def sample_scene_changes(frames, min_distance, last_hash=None):
+    """ Passes through frames whose dHash differs from the last kept frame by at least min_distance bits. """
+    for index, time_s, source, frame in frames:
+        frame_hash = frame_dhash(frame)
+        if min_distance > 0 and last_hash is not None and hamming_distance(frame_hash, last_hash) < min_distance: continue
+        last_hash = frame_hash
+        yield index, time_s, source, frame, frame_hash
+
+def iter_batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size: yield batch; batch = []
+    if batch: yield batch
+
+def _read_resume_point(output_path):
+    """
+    Returns (last_frame_index, last_dhash) from an existing JSON Lines output, or (None, None).
+    Only a final line without its newline (a write cut short by an interrupted job) is
+    truncated away; any complete line that is not a bulk record raises ValueError and the
+    file is left untouched.
+    """
+    if not os.path.exists(output_path): return None, None
+    last_record = None
+    with open(output_path, 'rb+') as f:
+        good_end = 0
+        for line_number, line in enumerate(f, 1):
+            if not line.endswith(b'\n'): # Only the last line can lack its newline
+                if line.startswith(b'{"frame": ') or b'{"frame": '.startswith(line): break # ...and it is the start of a record
+                raise ValueError(f"'{output_path}' line {line_number} is not a bulk output record; not resuming into it")
+            try:
+                record = json.loads(line)
+                last_record = (int(record['frame']), int(record['dhash'], 16))
+            except (ValueError, TypeError, KeyError):
+                raise ValueError(f"'{output_path}' line {line_number} is not a bulk output record; not resuming into it")
+            good_end += len(line)
+        if good_end < f.seek(0, os.SEEK_END): f.truncate(good_end)
+    return last_record if last_record is not None else (None, None)
+
+def _wait_for_bulk_models(tasks, cancel_event, timeout=600.0):
+    """
+    Bulk jobs process every sampled frame, so they wait for their models instead of returning
+    'loading'. Models served by inference workers are not loaded here (see _until_ready).
+    """
+    names = [name for task, name in WORKER_KIND_MODELS.items() if task in tasks and task not in inference_pools]
+    model_registry.warm_up(names)
+    deadline = time.monotonic() + timeout
+    while not all(model_registry.is_ready(name) for name in names):
+        states = model_registry.states()
+        failed = [name for name in names if states[name]['state'] == 'failed']
+        if failed: raise RuntimeError(f"Model(s) {failed} failed to load: {[states[n]['error'] for n in failed]}")
+        if time.monotonic() > deadline or cancel_event.is_set(): raise RuntimeError(f"Models {names} not ready")
+        time.sleep(0.5)
+
+def _until_ready(call, cancel_event):
+    """ Repeats call() while it reports {'status': 'loading'} (e.g. a worker still loading its model). """
+    result = call()
+    while isinstance(result, dict) and result.get('status') == 'loading' and not cancel_event.is_set():
+        time.sleep(1.0); result = call()
+    return result
+
+def _detect_bulk_batch(batch, tasks, language_code, imgsz, cancel_event):
+    """
+    Runs the requested tasks over one batch of sampled frames. Object frames go through the
+    same batcher / object workers as live frames, BULK_MAX_INFLIGHT at a time, so live
+    clients' frames are never queued behind a whole bulk batch.
+    """
+    conversions = [FrameConversions(item[3]) for item in batch]
+    results = [{} for _ in batch]
+    if 'object' in tasks:
+        for start in range(0, len(batch), BULK_MAX_INFLIGHT):
+            chunk = range(start, min(start + BULK_MAX_INFLIGHT, len(batch)))
+            waits = {i: submit_objects(conversions[i].yolo_input(imgsz), imgsz=imgsz) for i in chunk}
+            for i, wait in waits.items():
+                results[i]['object'] = wait()
+                if results[i]['object'].get('status') == 'loading':
+                    results[i]['object'] = _until_ready(lambda: infer_objects(conversions[i].yolo_input(imgsz), imgsz=imgsz), cancel_event)
+    for task in ('scene', 'text'):
+        if task not in tasks: continue
+        for result, item, conv in zip(results, batch, conversions):
+            result[task] = _until_ready(lambda: run_detection(MULTI_DETECTION_TASKS[task], item[3], language_code=language_code, conversions=conv, imgsz=imgsz), cancel_event)
+    return results
+
+class BulkJob:
+    """
+    Processes a video file or image directory into a JSON Lines file, one record per
+    sampled frame: {'frame', 'time_s', 'source', 'dhash', 'results': {task: result}}.
+    Frames are sampled at most every 1/fps seconds of video (fps=0: every frame) and,
+    with scene_change > 0, only when their dHash moved at least that many bits from the
+    last kept frame. With resume=True an existing output is continued after its last
+    record; otherwise it is overwritten.
+    """
+    def __init__(self, input_path, output_path, tasks=BULK_TASKS, fps=0.0, scene_change=0, language_code=DEFAULT_OCR_LANG,
+                 imgsz=YOLO_IMGSZ, batch_size=YOLO_BATCH_MAX_SIZE, resume=True):
+        unknown = [t for t in tasks if t not in BULK_TASKS]
+        if unknown: raise ValueError(f"Unsupported bulk tasks {unknown}; expected any of {list(BULK_TASKS)}")
+        if not os.path.exists(input_path): raise ValueError(f"Input '{input_path}' does not exist")
+        # The output is appended to, truncated on resume or overwritten: never let it be the input.
+        if not output_path.lower().endswith('.jsonl'): raise ValueError(f"Output '{output_path}' must be a .jsonl file")
+        if os.path.abspath(output_path) == os.path.abspath(input_path) or (os.path.exists(output_path) and os.path.samefile(output_path, input_path)):
+            raise ValueError("Output must not be the input")
+        self.input_path, self.output_path = input_path, output_path
+        self.tasks, self.fps, self.scene_change = tuple(tasks), float(fps), int(scene_change)
+        self.language_code = language_code if language_code in SUPPORTED_OCR_LANGS else DEFAULT_OCR_LANG
+        self.imgsz = snap_imgsz(imgsz) or YOLO_IMGSZ
+        self.batch_size, self.resume = max(1, int(batch_size)), resume
+        self.state = 'pending'
+        self.error = None
+        self.frames_written = 0
+        self.last_frame = None
+        self.started_at = None
+        self.cancel_event = threading.Event()
+
+    def _frames(self, start_frame, last_hash):
+        if os.path.isdir(self.input_path): frames = iter_image_frames(self.input_path, start_frame)
+        else: frames = iter_video_frames(self.input_path, self.fps, start_frame)
+        return sample_scene_changes(frames, self.scene_change, last_hash)
+
+    def run(self):
+        """ Runs the job to completion (or cancellation) in the calling thread. Returns stats(). """
+        self.state, self.started_at = 'running', time.time()
+        try:
+            last_frame, last_hash = _read_resume_point(self.output_path) if self.resume else (None, None)
+            start_frame = 0 if last_frame is None else last_frame + 1
+            if last_frame is not None: logger.info(f"Bulk: resuming '{self.input_path}' after frame {last_frame}.")
+            _wait_for_bulk_models(self.tasks, self.cancel_event)
+            os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+            with open(self.output_path, 'a' if self.resume else 'w', encoding='utf-8') as out:
+                for batch in iter_batches(self._frames(start_frame, last_hash), self.batch_size):
+                    if self.cancel_event.is_set(): self.state = 'cancelled'; break
+                    for item, results in zip(batch, _detect_bulk_batch(batch, self.tasks, self.language_code, self.imgsz, self.cancel_event)):
+                        index, time_s, source, _, frame_hash = item
+                        out.write(json.dumps({'frame': index, 'time_s': time_s, 'source': source, 'dhash': f'{frame_hash:016x}', 'results': results}) + '\n')
+                        self.last_frame = index
+                    out.flush() # A batch is durable before the next is read, so a resume repeats at most one batch
+                    self.frames_written += len(batch)
+            if self.state == 'running': self.state = 'done'
+        except Exception as e:
+            logger.error(f"Bulk job on '{self.input_path}' failed: {e}", exc_info=True)
+            self.state, self.error = 'failed', str(e)
+        logger.info(f"Bulk job on '{self.input_path}' {self.state}: {self.frames_written} frame(s) written to '{self.output_path}'.")
+        return self.stats()
+
+    def stats(self):
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        return {'state': self.state, 'error': self.error, 'input': self.input_path, 'output': self.output_path, 'tasks': list(self.tasks),
+                'frames_written': self.frames_written, 'last_frame': self.last_frame, 'elapsed_s': round(elapsed, 1)}
+
+bulk_jobs = {} # job_id -> BulkJob started over HTTP
+bulk_jobs_lock = threading.Lock()
 
 
 # --- WebSocket Handlers ---
 @socketio.on('connect')
 def handle_connect(): logger.info(f'Client connected: {request.sid}'); emit('response', {'result': 'Connected', 'event': 'connect'})
 @socketio.on('disconnect')
-def handle_disconnect(): logger.info(f'Client disconnected: {request.sid}')
+def handle_disconnect(): logger.info(f'Client disconnected: {request.sid}'); close_client_session(request.sid)
 
 @socketio.on('message')
 def handle_message(data):
     """Handles incoming messages for detection."""
     client_sid = request.sid; start_time = time.time(); detection_type = "unknown"; result = None
+    def respond(result, capture=None):
+        """ Emits a result to this client, echoing the optional 'request_id' so clients can match responses to frames. """
+        payload = {'result': result}
+        if isinstance(data, dict) and data.get('request_id') is not None: payload['request_id'] = data['request_id']
+        if capture is not None: payload['capture'] = capture
+        emit('response', payload)
     try:
-        if not isinstance(data, dict): logger.warning(f"Invalid data format from {client_sid}."); emit('response', {'result': {'status': 'error', 'message': 'Invalid data format'}}); return
+        if not isinstance(data, dict): logger.warning(f"Invalid data format from {client_sid}."); respond({'status': 'error', 'message': 'Invalid data format'}); return
 
         image_data = data.get('image')
         detection_type = data.get('type') # e.g., 'object_detection', 'scene_detection', 'text_detection', 'focus_detection'
         requested_language = DEFAULT_OCR_LANG
         focus_object_name = None # For focus mode
+        tasks = [] # For multi_detection
 
         # --- Get parameters based on type ---
-        if detection_type == 'text_detection':
+        if detection_type == 'multi_detection':
+            tasks = data.get('tasks')
+            if not isinstance(tasks, list) or not tasks or not all(isinstance(t, str) for t in tasks):
+                logger.warning(f"Multi detection request from {client_sid} missing 'tasks'.")
+                respond({'status': 'error', 'message': "Missing 'tasks' for multi detection"}); return
+            tasks = list(OrderedDict.fromkeys(t.strip().lower() for t in tasks)) # Dedupe, keep order
+            unknown = [t for t in tasks if t not in MULTI_DETECTION_TASKS]
+            if unknown:
+                logger.warning(f"Multi detection request from {client_sid} with unsupported tasks {unknown}.")
+                respond({'status': 'error', 'message': f"Unsupported tasks {unknown}; expected any of {sorted(MULTI_DETECTION_TASKS)}"}); return
+        if detection_type == 'text_detection' or 'text' in tasks:
             lang_payload = data.get('language', DEFAULT_OCR_LANG).lower()
             requested_language = lang_payload if lang_payload in SUPPORTED_OCR_LANGS else DEFAULT_OCR_LANG
             if requested_language != lang_payload: logger.warning(f"Client {client_sid} invalid lang '{lang_payload}', using '{DEFAULT_OCR_LANG}'.")
-        elif detection_type == 'focus_detection':
+        if detection_type == 'focus_detection' or 'focus' in tasks:
             focus_object_name = data.get('focus_object')
-            if not focus_object_name:
+            if isinstance(focus_object_name, str): focus_object_name = focus_object_name.strip()[:MAX_FOCUS_OBJECT_LENGTH]
+            if not focus_object_name or not isinstance(focus_object_name, str):
                 logger.warning(f"Focus detection request from {client_sid} missing 'focus_object'.")
-                emit('response', {'result': {'status': 'error', 'message': "Missing 'focus_object' for focus detection"}}); return
+                respond({'status': 'error', 'message': "Missing 'focus_object' for focus detection"}); return
         # --- --- --- --- --- --- --- --- --- ---
 
-        if not image_data or not detection_type: logger.warning(f"Missing 'image' or 'type' from {client_sid}."); emit('response', {'result': {'status': 'error', 'message': "Missing 'image' or 'type'"}}); return
+        if not image_data or not detection_type: logger.warning(f"Missing 'image' or 'type' from {client_sid}."); respond({'status': 'error', 'message': "Missing 'image' or 'type'"}); return
 
         log_extra = ""
         if detection_type == 'text_detection': log_extra = f", Lang: '{requested_language}'"
         elif detection_type == 'focus_detection': log_extra = f", Focus: '{focus_object_name}'"
+        elif detection_type == 'multi_detection': log_extra = f", Tasks: {tasks}"
         logger.info(f"Processing '{detection_type}' from {client_sid}{log_extra}")
 
-        # --- Image Decoding ---
-        try:
-            if ',' in image_data: _, encoded = image_data.split(',', 1)
-            else: encoded = image_data
-            image_bytes = base64.b64decode(encoded)
-            image_np = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
-            if image_np is None: raise ValueError("cv2.imdecode failed")
-        except Exception as decode_err: logger.error(f"Image decode error for {client_sid}: {decode_err}", exc_info=True); emit('response', {'result': {'status': 'error', 'message': 'Invalid image data'}}); return
-        # --- --- --- --- --- ---
-
-        # --- Perform Detection ---
-        if detection_type == 'object_detection':
-            result = detect_objects(image_np) # Normal mode
-        elif detection_type == 'focus_detection':
-            result = detect_objects(image_np, focus_object=focus_object_name) # Focus mode
-        elif detection_type == 'scene_detection':
-            # Scene detection doesn't usually return structured status, wrap it for consistency
-            scene_label = detect_scene(image_np)
-            if "Error" in scene_label: result = {'status': 'error', 'message': scene_label}
-            elif "Unknown" in scene_label: result = {'status': 'none'} # Or 'ok' with label? Depends on FE.
-            else: result = {'status': 'ok', 'scene': scene_label}
-        elif detection_type == 'text_detection':
-            # Wrap text detection result
-            text_result = detect_text(image_np, language_code=requested_language)
-            if "Error" in text_result: result = {'status': 'error', 'message': text_result}
-            elif "No text detected" in text_result: result = {'status': 'none'}
-            else: result = {'status': 'ok', 'text': text_result}
-        else:
+        if detection_type not in SUPPORTED_DETECTION_TYPES:
             logger.warning(f"Unsupported type '{detection_type}' from {client_sid}")
-            result = {'status': 'error', 'message': f"Unsupported detection type '{detection_type}'"}
+            respond({'status': 'error', 'message': f"Unsupported detection type '{detection_type}'"}); return
+
+        # --- Latest-Frame-Wins Queue ---
+        # Wait for this session's previous frame to finish; if a newer frame arrives in the
+        # meantime this one is dropped before it is even decoded.
+        session = get_client_session(client_sid)
+        if data.get('latency_budget_ms') is not None:
+            try: session.latency.set_budget(data['latency_budget_ms'])
+            except (TypeError, ValueError): logger.warning(f"Client {client_sid} invalid latency_budget_ms '{data['latency_budget_ms']}'.")
+        with stage_timer(detection_type, 'queue_wait'): acquired = session.frame_queue.acquire()
+        if not acquired:
+            logger.debug(f"Dropped stale '{detection_type}' frame from {client_sid}.")
+            requests_total.inc((detection_type, 'dropped'))
+            if SEND_DROPPED_RESPONSES: respond({'status': 'dropped'})
+            return
         # --- --- --- --- --- ---
 
-        processing_time = time.time() - start_time
-        # Log status and maybe primary result for quick check
-        status_log = result.get('status', 'unknown') if isinstance(result, dict) else 'raw'
-        log_detail = ""
-        if isinstance(result, dict):
-            if result.get('status') == 'ok' and result.get('detections'): log_detail = f": {len(result['detections'])} objects"
-            elif result.get('status') == 'found': log_detail = f": Found '{result['detection']['name']}'"
-            elif result.get('status') == 'ok' and result.get('scene'): log_detail = f": Scene '{result['scene']}'"
-            elif result.get('status') == 'ok' and result.get('text'): log_detail = f": Text found" # Avoid logging text itself
-        logger.info(f"Completed '{detection_type}' for {client_sid} in {processing_time:.3f}s. Status: {status_log}{log_detail}")
-
-        emit('response', {'result': result}) # Send the structured result back
+        unfinished = [] # multi_detection tasks that outlived MULTI_TASK_TIMEOUT_S
+        try:
+            # --- Image Decoding ---
+            try:
+                with stage_timer(detection_type, 'decode'): image_np = decode_image(data)
+            except Exception as decode_err: logger.error(f"Image decode error for {client_sid}: {decode_err}", exc_info=True); errors_total.inc((detection_type, 'decode')); respond({'status': 'error', 'message': 'Invalid image data'}); return
+            # --- --- --- --- --- ---
+
+            # --- Perform Detection ---
+            # YOLO input size: the client's 'imgsz' if given, else the session's latency controller.
+            requested_imgsz = snap_imgsz(data['imgsz']) if data.get('imgsz') is not None else None
+            imgsz = requested_imgsz or session.latency.imgsz
+            with stage_timer(detection_type, 'detection'):
+                if detection_type == 'multi_detection': result, unfinished = run_multi_detection(tasks, image_np, language_code=requested_language, focus_object=focus_object_name, session=session, imgsz=imgsz)
+                else: result = run_detection(detection_type, image_np, language_code=requested_language, focus_object=focus_object_name, session=session, imgsz=imgsz)
+            # --- --- --- --- --- ---
+
+            processing_time = time.time() - start_time
+            # Log status and maybe primary result for quick check
+            status_log = result.get('status', 'unknown') if isinstance(result, dict) else 'raw'
+            log_detail = ""
+            if isinstance(result, dict):
+                if result.get('status') == 'ok' and result.get('detections'): log_detail = f": {len(result['detections'])} objects"
+                elif result.get('status') == 'found': log_detail = f": Found '{result['detection']['name']}'"
+                elif result.get('status') == 'ok' and result.get('scene'): log_detail = f": Scene '{result['scene']}'"
+                elif result.get('status') == 'ok' and result.get('text'): log_detail = f": Text found" # Avoid logging text itself
+                elif result.get('results'): log_detail = ": " + ", ".join(f"{t}={r.get('status')}" for t, r in result['results'].items())
+            logger.info(f"Completed '{detection_type}' for {client_sid} in {processing_time:.3f}s. Status: {status_log}{log_detail}")
+
+            # --- Capture Settings ---
+            # Fed back to the client whenever they change so it stops uploading unused pixels.
+            task_types = [MULTI_DETECTION_TASKS[t] for t in tasks] if detection_type == 'multi_detection' else [detection_type]
+            used_yolo = any(t in ('object_detection', 'focus_detection') for t in task_types)
+            session.latency.record(processing_time, used_yolo=used_yolo)
+            capture = capture_settings(task_types, image_np.shape, requested_imgsz or session.latency.imgsz, session.latency.fps)
+            if capture == session.last_capture: capture = None
+            else: session.last_capture = capture
+            # --- --- --- --- --- ---
+
+            with stage_timer(detection_type, 'emit'): respond(result, capture=capture) # Send the structured result back
+            requests_total.inc((detection_type, status_log))
+            if metrics_sampled(): request_seconds.observe(time.time() - start_time, (detection_type,))
+        finally:
+            # Timed-out multi_detection tasks still use this session's tracker and caches;
+            # hold the session's slot until they finish so the next frame never overlaps them.
+            if unfinished: wait_futures(unfinished)
+            session.frame_queue.release()
 
     except Exception as e:
         processing_time = time.time() - start_time
         logger.error(f"Unhandled error in handle_message ('{detection_type}') for {client_sid} after {processing_time:.3f}s: {e}", exc_info=True)
-        try: emit('response', {'result': {'status': 'error', 'message': 'Internal server error during processing.'}})
+        errors_total.inc((detection_type if detection_type in SUPPORTED_DETECTION_TYPES else 'unknown', 'unhandled'))
+        try: respond({'status': 'error', 'message': 'Internal server error during processing.'})
         except Exception as emit_e: logger.error(f"Failed to emit error response to {client_sid}: {emit_e}")
 
 
@@ -380,6 +2627,102 @@ def default_error_handler(e):
 # --- HTTP Routes (Keep as is) ---
 @app.route('/')
 def home(): test_html_path = os.path.join(template_dir, 'test.html'); return render_template('test.html') if os.path.exists(test_html_path) else "VisionAid Backend is running."
+@app.route('/health', methods=['GET'])
+def health():
+    """ Model load state (from the inference workers for models they serve); 200 once every model is ready (usable as a readiness probe), else 503. """
+    states = model_states()
+    ready = all(status['state'] == 'ready' for status in states.values())
+    return jsonify({'ready': ready, 'models': states}), (200 if ready else 503)
+@app.route('/session_stats', methods=['GET'])
+def session_stats():
+    """ Per-session queue depth and drop counters for all connected clients. """
+    with client_sessions_lock: sessions = list(client_sessions.values())
+    return jsonify({'active_sessions': len(sessions), 'sessions': {s.sid: s.stats() for s in sessions}})
+@app.route('/ocr_stats', methods=['GET'])
+def ocr_stats():
+    """
+    Active OCR engine, pool occupancy and recent text_detection OCR latencies per language.
+    With 'text' inference workers, OCR runs there: latencies are merged from all workers and
+    'pool' lists each worker's own engine pool.
+    """
+    text_pool = inference_pools.get('text')
+    if text_pool: pool_stats = {f'worker-{index}': stats['ocr_pool'] for index, stats in sorted(text_pool.worker_stats.items())}
+    else: pool_stats = ocr_pool.stats() if ocr_pool else {}
+    return jsonify({'engine': 'pool' if ocr_pool else 'subprocess', 'pool': pool_stats, 'latency': ocr_latency_stats()})
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """ Prometheus text-format metrics: stage/request latency histograms, counters and live gauges. """
+    with client_sessions_lock: sessions = list(client_sessions.values())
+    session_stats = [session.stats() for session in sessions]
+    lines = []
+    for metric in (stage_seconds, request_seconds, yolo_batch_frames, requests_total, errors_total):
+        lines.extend(metric.render())
+    lines.extend(_gauge_lines('visionaid_active_sessions', "Connected client sessions.", [({}, len(sessions))]))
+    lines.extend(_gauge_lines('visionaid_queue_depth', "Frames queued or in flight across all sessions.", [({}, sum(st['queue_depth'] for st in session_stats))]))
+    lines.extend(_gauge_lines('visionaid_batcher_pending', "Frames waiting in the YOLO-World batcher.", [({}, object_batcher.pending())]))
+    lines.extend(_gauge_lines('visionaid_frame_cache_hits', "Temporal cache hits across connected sessions.",
+                              [({'cache': cache}, sum(st[cache]['hits'] for st in session_stats)) for cache in ('scene_cache', 'text_cache')]))
+    lines.extend(_gauge_lines('visionaid_frame_cache_misses', "Temporal cache misses across connected sessions.",
+                              [({'cache': cache}, sum(st[cache]['misses'] for st in session_stats)) for cache in ('scene_cache', 'text_cache')]))
+    states = model_states()
+    lines.extend(_gauge_lines('visionaid_model_state', "1 for the current load state of each model.",
+                              [({'model': name, 'state': state}, int(status['state'] == state)) for name, status in states.items() for state in MODEL_STATE_ORDER]))
+    lines.extend(_gauge_lines('visionaid_model_load_seconds', "Model load time.",
+                              [({'model': name}, status['load_time_s']) for name, status in states.items() if status['load_time_s'] is not None]))
+    # Stage timings, batch sizes, errors and OCR latencies from inference workers are merged
+    # into the metrics above; cache and pool gauges are reported per process.
+    embedding_caches = [({'process': 'server'}, class_embedding_cache.stats())]
+    if 'object' in inference_pools:
+        embedding_caches += [({'process': f'object-worker-{index}'}, stats['class_embedding_cache']) for index, stats in sorted(inference_pools['object'].worker_stats.items())]
+    lines.extend(_gauge_lines('visionaid_class_embedding_cache_hits', "YOLO-World vocabulary embedding cache hits per process.", [(labels, st['hits']) for labels, st in embedding_caches]))
+    lines.extend(_gauge_lines('visionaid_class_embedding_cache_misses', "YOLO-World vocabulary embedding cache misses per process.", [(labels, st['misses']) for labels, st in embedding_caches]))
+    if inference_pools:
+        pool_stats = {kind: pool.stats() for kind, pool in inference_pools.items()}
+        lines.extend(_gauge_lines('visionaid_inference_workers_alive', "Live inference worker processes per task kind.", [({'kind': k}, st['alive']) for k, st in pool_stats.items()]))
+        lines.extend(_gauge_lines('visionaid_inference_worker_restarts', "Inference worker restarts per task kind.", [({'kind': k}, st['restarts']) for k, st in pool_stats.items()]))
+        lines.extend(_gauge_lines('visionaid_inference_worker_inflight', "Tasks handed to workers and not yet answered.", [({'kind': k}, st['inflight']) for k, st in pool_stats.items()]))
+    if ocr_pool:
+        ocr_pools = [stats['ocr_pool'] for stats in inference_pools['text'].worker_stats.values()] if 'text' in inference_pools else [ocr_pool.stats()]
+        engines = {}
+        for pool in ocr_pools:
+            for lang, st in pool.items(): engines[lang] = engines.get(lang, 0) + st['engines']
+        lines.extend(_gauge_lines('visionaid_ocr_engines', "Live OCR engines per language (summed over text workers).", [({'lang': lang}, count) for lang, count in sorted(engines.items())]))
+    return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+def _bulk_path(relative_path):
+    """ Resolves a client-supplied path inside BULK_DATA_DIR (None if it escapes it). """
+    path = os.path.abspath(os.path.join(BULK_DATA_DIR, relative_path))
+    try: inside = os.path.commonpath([path, BULK_DATA_DIR]) == BULK_DATA_DIR
+    except ValueError: return None # Different drives on Windows
+    return path if inside else None
+@app.route('/bulk', methods=['POST'])
+def start_bulk_job():
+    """
+    Starts a background bulk job. JSON body: 'input' (video file or image directory) and
+    optional 'output' (default '<input>.jsonl'), both relative to BULK_DATA_DIR, plus 'tasks',
+    'fps', 'scene_change', 'language', 'imgsz' and 'resume' (default true). Returns the job id.
+    """
+    body = request.get_json(silent=True) or {}
+    input_path = _bulk_path(str(body.get('input', '')))
+    output_path = _bulk_path(str(body.get('output') or f"{str(body.get('input', '')).rstrip('/')}.jsonl"))
+    if not body.get('input') or input_path is None or output_path is None: return jsonify({'status': 'error', 'message': "'input' and 'output' must be paths inside BULK_DATA_DIR"}), 400
+    try:
+        job = BulkJob(input_path, output_path, tasks=body.get('tasks', BULK_TASKS), fps=body.get('fps', 0), scene_change=body.get('scene_change', 0),
+                      language_code=body.get('language', DEFAULT_OCR_LANG), imgsz=body.get('imgsz', YOLO_IMGSZ), resume=bool(body.get('resume', True)))
+    except (TypeError, ValueError) as e: return jsonify({'status': 'error', 'message': str(e)}), 400
+    with bulk_jobs_lock:
+        if any(j.output_path == output_path and j.state in ('pending', 'running') for j in bulk_jobs.values()):
+            return jsonify({'status': 'error', 'message': "A job is already writing to that output"}), 409
+        job_id = hashlib.sha1(f'{output_path}:{time.time()}'.encode()).hexdigest()[:12]
+        bulk_jobs[job_id] = job
+    threading.Thread(target=job.run, name=f'bulk-{job_id}', daemon=True).start()
+    return jsonify({'status': 'started', 'job_id': job_id, **job.stats()}), 202
+@app.route('/bulk/<job_id>', methods=['GET', 'DELETE'])
+def bulk_job_status(job_id):
+    """ Progress of a bulk job; DELETE cancels it after the current batch (rerun with resume to continue). """
+    with bulk_jobs_lock: job = bulk_jobs.get(job_id)
+    if job is None: return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+    if request.method == 'DELETE': job.cancel_event.set()
+    return jsonify(job.stats())
 @app.route('/update_customization', methods=['POST'])
 def update_customization(): pass # Keep existing implementation
 @app.route('/get_user_info', methods=['GET'])
@@ -390,12 +2733,38 @@ def add_test_user(): pass # Keep existing implementation
 
 # --- Main Execution Point ---
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="VisionAid backend")
+    parser.add_argument('--fetch-models', action='store_true', help="Download model files into MODEL_CACHE_DIR and exit.")
+    parser.add_argument('--check-backends', metavar='SAMPLE_DIR', help="Compare inference backends against PyTorch on the images in SAMPLE_DIR, print JSON and exit.")
+    parser.add_argument('--bulk', metavar='INPUT', help="Process a video file or image directory into JSON Lines and exit.")
+    parser.add_argument('--bulk-output', metavar='FILE', help="JSON Lines output for --bulk (default: INPUT.jsonl).")
+    parser.add_argument('--bulk-tasks', default=','.join(BULK_TASKS), help="Comma-separated tasks for --bulk (object,scene,text).")
+    parser.add_argument('--bulk-fps', type=float, default=0.0, help="Sample at most this many video frames per second (0 = every frame).")
+    parser.add_argument('--bulk-scene-change', type=int, default=0, help="Only keep frames whose dHash moved at least this many bits (0 = off).")
+    parser.add_argument('--bulk-language', default=DEFAULT_OCR_LANG, help="OCR language for --bulk.")
+    parser.add_argument('--bulk-no-resume', action='store_true', help="Overwrite an existing --bulk output instead of resuming it.")
+    args = parser.parse_args()
+    if args.fetch_models:
+        fetch_model_files(); sys.exit(0)
+    if args.check_backends:
+        print(json.dumps(check_backend_accuracy(args.check_backends), indent=2)); sys.exit(0)
+    if args.bulk:
+        # The CLI reads and writes local paths directly; BULK_DATA_DIR only restricts the HTTP route.
+        try:
+            job = BulkJob(args.bulk, args.bulk_output or f"{args.bulk.rstrip(os.sep)}.jsonl", tasks=[t.strip() for t in args.bulk_tasks.split(',') if t.strip()],
+                          fps=args.bulk_fps, scene_change=args.bulk_scene_change, language_code=args.bulk_language, resume=not args.bulk_no_resume)
+        except ValueError as e:
+            print(f"--bulk: {e}", file=sys.stderr); sys.exit(2)
+        start_inference_workers()
+        stats = job.run(); print(json.dumps(stats, indent=2)); sys.exit(0 if stats['state'] == 'done' else 1)
     logger.info("Starting Flask-SocketIO server...")
     host_ip = os.environ.get('FLASK_HOST', '0.0.0.0')
     port_num = int(os.environ.get('FLASK_PORT', 5000))
     debug_mode = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'
     use_reloader = debug_mode
     logger.info(f"Server listening on {host_ip}:{port_num} (Debug: {debug_mode}, Reloader: {use_reloader})")
+    # With the reloader, only the child process that actually serves requests starts workers.
+    if not use_reloader or os.environ.get('WERKZEUG_RUN_MAIN') == 'true': start_inference_workers()
     try:
         socketio.run(app, debug=debug_mode, host=host_ip, port=port_num, use_reloader=use_reloader, allow_unsafe_werkzeug=True if use_reloader else False)
     except Exception as run_e: logger.critical(f"Failed to start server: {run_e}", exc_info=True); sys.exit(1)
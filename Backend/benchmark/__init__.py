@@ -0,0 +1,15 @@
+# backend/benchmark/__init__.py
+"""
+Offline performance harness for the VisionAid backend.
+
+Run from the Backend directory:
+
+    python -m benchmark replay FRAMES_DIR --output replay.json [--stub]
+    python -m benchmark serve --stub                      # local server with stub models
+    python -m benchmark load FRAMES_DIR --clients 1,4,16 --fps 5 --output load.json
+
+`replay` calls detect_objects / detect_scene / detect_text (and focus mode) directly on
+recorded frames; `load` streams frames from N concurrent Socket.IO clients against a
+running server. Both write JSON results that can be compared across commits. `--stub`
+swaps the ML models for cheap stand-ins so the harness runs without the real weights.
+"""
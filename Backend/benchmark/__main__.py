@@ -0,0 +1,65 @@
+# backend/benchmark/__main__.py
+import argparse
+
+from benchmark.common import write_results
+
+
+def _csv(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description="VisionAid backend benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    replay = sub.add_parser('replay', help="Replay recorded frames through the detection functions directly.")
+    replay.add_argument('frames_dir')
+    replay.add_argument('--tasks', type=_csv, default=['object', 'focus', 'scene', 'text'], help="Comma-separated: object,focus,scene,text")
+    replay.add_argument('--repeat', type=int, default=1)
+    replay.add_argument('--warmup', type=int, default=2, help="Untimed calls per task before measuring.")
+    replay.add_argument('--limit', type=int, default=None, help="Use at most this many frames.")
+    replay.add_argument('--focus-object', default='person')
+    replay.add_argument('--language', default='eng')
+    replay.add_argument('--stub', action='store_true', help="Use stub models instead of the real weights.")
+    replay.add_argument('--stub-latency-ms', type=float, default=0.0, help="Simulated per-frame inference time for stub models.")
+    replay.add_argument('--output', help="JSON results file (default: print to stdout).")
+
+    load = sub.add_parser('load', help="Stream frames from concurrent Socket.IO clients against a running server.")
+    load.add_argument('frames_dir')
+    load.add_argument('--url', default='http://127.0.0.1:5000')
+    load.add_argument('--clients', type=lambda v: [int(c) for c in _csv(v)], default=[1, 4, 16], help="Comma-separated client counts, one stage each.")
+    load.add_argument('--fps', type=float, default=5.0, help="Target frames per second per client.")
+    load.add_argument('--duration', type=float, default=30.0, help="Seconds per stage.")
+    load.add_argument('--task', choices=['object', 'focus', 'scene', 'text'], default='object')
+    load.add_argument('--limit', type=int, default=50)
+    load.add_argument('--jpeg-quality', type=int, default=80)
+    load.add_argument('--width', type=int, default=640, help="Downscale frames to this width before sending (0 = as recorded).")
+    load.add_argument('--base64', action='store_true', help="Send legacy base64 data URLs instead of binary attachments.")
+    load.add_argument('--focus-object', default='person')
+    load.add_argument('--language', default='eng')
+    load.add_argument('--output')
+
+    serve = sub.add_parser('serve', help="Run the backend server (optionally with stub models) for load tests.")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=5000)
+    serve.add_argument('--stub', action='store_true')
+    serve.add_argument('--stub-latency-ms', type=float, default=0.0)
+
+    args = parser.parse_args()
+    if args.command == 'replay':
+        from benchmark.replay import run_replay
+        write_results(run_replay(args.frames_dir, args.tasks, repeat=args.repeat, warmup=args.warmup, limit=args.limit, focus_object=args.focus_object,
+                                 language=args.language, stub=args.stub, stub_latency_ms=args.stub_latency_ms), args.output)
+    elif args.command == 'load':
+        from benchmark.loadgen import run_load
+        write_results(run_load(args.frames_dir, args.url, args.clients, args.fps, args.duration, task=args.task, limit=args.limit, jpeg_quality=args.jpeg_quality,
+                               width=args.width, use_base64=args.base64, focus_object=args.focus_object, language=args.language), args.output)
+    elif args.command == 'serve':
+        from benchmark.common import import_app
+        app_module = import_app(stub=args.stub, stub_latency_ms=args.stub_latency_ms)
+        if not args.stub: app_module.start_inference_workers() # Stub models only exist in this process
+        app_module.socketio.run(app_module.app, host=args.host, port=args.port, debug=False, use_reloader=False, allow_unsafe_werkzeug=True)
+
+
+if __name__ == '__main__':
+    main()
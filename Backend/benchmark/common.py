@@ -0,0 +1,105 @@
+# backend/benchmark/common.py
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import subprocess
+
+import cv2
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def import_app(stub=False, stub_latency_ms=0.0):
+    """
+    Imports the backend module (App.py). With stub=True, background model warm-up is
+    disabled before import and the registry is pointed at stub models instead.
+    """
+    if stub:
+        os.environ['MODEL_WARMUP'] = 'False'
+        os.environ.setdefault('OCR_ENGINE', 'subprocess')
+    if BACKEND_DIR not in sys.path: sys.path.insert(0, BACKEND_DIR)
+    import App
+    if stub:
+        from benchmark.stubs import install_stub_models
+        install_stub_models(App, latency_ms=stub_latency_ms)
+    return App
+
+
+def wait_for_models(app_module, names, timeout=600.0):
+    """ Triggers loading of the given models and blocks until they are ready (or fail / time out). """
+    app_module.model_registry.warm_up(names)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        states = app_module.model_registry.states()
+        if all(states[name]['state'] in ('ready', 'failed') for name in names): return states
+        time.sleep(0.2)
+    raise TimeoutError(f"Models {names} not ready after {timeout:.0f}s")
+
+
+def frame_paths(frames_dir, limit=None):
+    paths = sorted(os.path.join(frames_dir, f) for f in os.listdir(frames_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    if not paths: raise SystemExit(f"No frames ({', '.join(IMAGE_EXTENSIONS)}) found in {frames_dir}")
+    return paths[:limit] if limit else paths
+
+
+def read_frame(path):
+    frame = cv2.imread(path, cv2.IMREAD_COLOR)
+    if frame is None: raise ValueError(f"Could not read frame {path}")
+    return frame
+
+
+def latency_summary(samples_s, wall_time_s=None):
+    """ p50/p95/p99/mean latency (ms) and throughput for a list of per-call durations (seconds). """
+    if not samples_s: return {'count': 0}
+    ordered = sorted(samples_s)
+    def pct(q): return round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000, 2)
+    summary = {
+        'count': len(ordered),
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+    if wall_time_s: summary['throughput_fps'] = round(len(ordered) / wall_time_s, 2)
+    return summary
+
+
+def peak_rss_mb():
+    """ Peak resident set size of this process in MB (None where unsupported). """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1) # bytes on macOS, KB on Linux
+
+
+def run_metadata(extra=None):
+    """ Environment details recorded with every result file so runs can be compared across commits. """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    meta = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_commit': commit,
+        'host': socket.gethostname(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+    }
+    meta.update(extra or {})
+    return meta
+
+
+def write_results(results, output_path):
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f: json.dump(results, f, indent=2)
+        print(f"Results written to {output_path}")
+    else:
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,126 @@
+# backend/benchmark/loadgen.py
+"""
+Socket.IO load generator: opens N concurrent clients against a running backend and
+streams frames at a target FPS, measuring end-to-end latency (emit -> 'response'),
+achieved throughput and drop/error rates. Passing several client counts runs one
+stage per count to find the saturation point.
+"""
+import time
+import base64
+import threading
+
+import cv2
+import socketio
+
+from benchmark.common import frame_paths, read_frame, latency_summary, run_metadata
+
+TASK_TYPES = {'object': 'object_detection', 'focus': 'focus_detection', 'scene': 'scene_detection', 'text': 'text_detection'}
+
+
+def _encode_frames(paths, jpeg_quality, width):
+    """ Pre-encodes frames as JPEG bytes so client-side encoding doesn't skew the measurement. """
+    encoded = []
+    for path in paths:
+        frame = read_frame(path)
+        if width and frame.shape[1] > width:
+            frame = cv2.resize(frame, (width, int(frame.shape[0] * width / frame.shape[1])), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        if ok: encoded.append(buffer.tobytes())
+    return encoded
+
+
+class LoadClient:
+    """ One simulated phone: streams frames at `fps` and records the latency of each response. """
+    def __init__(self, index, url, frames, task, fps, use_base64, focus_object, language):
+        self.index = index
+        self.url = url
+        self.frames = frames
+        self.task = task
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.use_base64 = use_base64
+        self.focus_object = focus_object
+        self.language = language
+        self.sent = 0
+        self.unanswered = 0
+        self.latencies = []
+        self.statuses = {}
+        self._pending = {} # request_id -> send time
+        self._lock = threading.Lock()
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on('response', self._on_response)
+
+    def _on_response(self, data):
+        request_id = data.get('request_id') if isinstance(data, dict) else None
+        if request_id is None: return # e.g. the 'Connected' greeting
+        with self._lock:
+            sent_at = self._pending.pop(request_id, None)
+            status = (data.get('result') or {}).get('status', 'unknown') if isinstance(data.get('result'), dict) else 'raw'
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if sent_at is not None and status != 'dropped': self.latencies.append(time.perf_counter() - sent_at)
+
+    def _payload(self, frame_bytes, request_id):
+        payload = {'type': TASK_TYPES[self.task], 'request_id': request_id}
+        payload['image'] = 'data:image/jpeg;base64,' + base64.b64encode(frame_bytes).decode('ascii') if self.use_base64 else frame_bytes
+        if self.task == 'focus': payload['focus_object'] = self.focus_object
+        if self.task == 'text': payload['language'] = self.language
+        return payload
+
+    def run(self, duration_s, stop_event):
+        self.sio.connect(self.url, transports=['websocket'])
+        try:
+            next_send = time.perf_counter()
+            end = next_send + duration_s
+            while time.perf_counter() < end and not stop_event.is_set():
+                request_id = f"{self.index}-{self.sent}"
+                frame_bytes = self.frames[self.sent % len(self.frames)]
+                with self._lock: self._pending[request_id] = time.perf_counter()
+                self.sio.emit('message', self._payload(frame_bytes, request_id))
+                self.sent += 1
+                next_send += self.interval
+                time.sleep(max(0.0, next_send - time.perf_counter()))
+            time.sleep(min(5.0, max(1.0, 2 * self.interval))) # Let in-flight responses arrive
+        finally:
+            self.sio.disconnect()
+        with self._lock: self.unanswered = len(self._pending)
+
+
+def run_stage(url, frames, clients, fps, duration_s, task, use_base64, focus_object, language):
+    stop_event = threading.Event()
+    load_clients = [LoadClient(i, url, frames, task, fps, use_base64, focus_object, language) for i in range(clients)]
+    threads = [threading.Thread(target=c.run, args=(duration_s, stop_event), daemon=True) for c in load_clients]
+    start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall_time = time.perf_counter() - start
+
+    latencies = [lat for c in load_clients for lat in c.latencies]
+    statuses = {}
+    for c in load_clients:
+        for status, count in c.statuses.items(): statuses[status] = statuses.get(status, 0) + count
+    sent = sum(c.sent for c in load_clients)
+    stage = {
+        'clients': clients,
+        'target_fps_per_client': fps,
+        'sent': sent,
+        'statuses': statuses,
+        'unanswered': sum(c.unanswered for c in load_clients),
+        'drop_rate': round(statuses.get('dropped', 0) / sent, 4) if sent else 0.0,
+        'completed_fps': round(len(latencies) / duration_s, 2),
+        'wall_time_s': round(wall_time, 2),
+        'latency': latency_summary(latencies),
+    }
+    print(f"[load] {clients} client(s) @ {fps} fps: {stage['completed_fps']} fps completed, p95 {stage['latency'].get('p95_ms')} ms, drop rate {stage['drop_rate']}")
+    return stage
+
+
+def run_load(frames_dir, url, client_counts, fps, duration_s, task='object', limit=50, jpeg_quality=80, width=640, use_base64=False, focus_object='person', language='eng'):
+    frames = _encode_frames(frame_paths(frames_dir, limit), jpeg_quality, width)
+    results = {
+        'meta': run_metadata({
+            'mode': 'load', 'url': url, 'frames_dir': frames_dir, 'frames': len(frames), 'task': task,
+            'fps_per_client': fps, 'duration_s': duration_s, 'transport': 'base64' if use_base64 else 'binary',
+            'jpeg_quality': jpeg_quality, 'width': width,
+        }),
+        'stages': [run_stage(url, frames, clients, fps, duration_s, task, use_base64, focus_object, language) for clients in client_counts],
+    }
+    return results
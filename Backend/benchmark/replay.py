@@ -0,0 +1,63 @@
+# backend/benchmark/replay.py
+"""
+Replays a directory of recorded frames through the detection functions directly
+(no Socket.IO) and reports per-task latency percentiles, throughput and peak RSS.
+"""
+import time
+
+from benchmark.common import import_app, wait_for_models, frame_paths, read_frame, latency_summary, peak_rss_mb, run_metadata
+
+TASK_MODELS = {'object': ['yolo'], 'focus': ['yolo'], 'scene': ['places365'], 'text': []}
+
+
+def _task_runner(app_module, task, focus_object, language):
+    if task == 'object': detect = lambda frame: app_module.detect_objects(frame)
+    elif task == 'focus': detect = lambda frame: app_module.detect_objects(frame, focus_object=focus_object)
+    elif task == 'scene': detect = lambda frame: app_module.detect_scene(frame)
+    elif task == 'text': detect = lambda frame: app_module.detect_text(frame, language_code=language)
+    else: raise ValueError(f"Unknown task '{task}' (expected one of {sorted(TASK_MODELS)})")
+
+    def run(frame):
+        # detect_scene raises instead of returning a status when its model failed to load.
+        try: return detect(frame)
+        except app_module.ModelNotReady as e: return app_module.model_unavailable_result(e)
+    return run
+
+
+def _is_error(result):
+    if isinstance(result, dict): return result.get('status') in ('error', 'loading')
+    return isinstance(result, str) and result.startswith('Error')
+
+
+def run_replay(frames_dir, tasks, repeat=1, warmup=2, limit=None, focus_object='person', language='eng', stub=False, stub_latency_ms=0.0):
+    app_module = import_app(stub=stub, stub_latency_ms=stub_latency_ms)
+    paths = frame_paths(frames_dir, limit)
+    needed = sorted({name for task in tasks for name in TASK_MODELS[task]})
+    model_states = wait_for_models(app_module, needed) if needed else {}
+
+    results = {
+        'meta': run_metadata({
+            'mode': 'replay', 'frames_dir': frames_dir, 'frames': len(paths), 'repeat': repeat, 'stub': stub,
+            'yolo_backend': app_module.YOLO_BACKEND, 'places_backend': app_module.PLACES_BACKEND,
+            'ocr_engine': 'pool' if app_module.ocr_pool else 'subprocess',
+        }),
+        'model_load': model_states,
+        'tasks': {},
+    }
+    frames = [read_frame(path) for path in paths] # Decoded once, so wall time covers only detection
+    for task in tasks:
+        run = _task_runner(app_module, task, focus_object, language)
+        for frame in frames[:warmup]: run(frame) # Warm-up calls are not timed
+        samples, errors = [], 0
+        busy_start = time.perf_counter()
+        for _ in range(repeat):
+            for frame in frames:
+                start = time.perf_counter()
+                outcome = run(frame)
+                samples.append(time.perf_counter() - start)
+                errors += _is_error(outcome)
+        wall_time = time.perf_counter() - busy_start
+        results['tasks'][task] = dict(latency_summary(samples, wall_time_s=wall_time), errors=errors, wall_time_s=round(wall_time, 2))
+        print(f"[replay] {task}: {results['tasks'][task]}")
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results